@@ -0,0 +1,79 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import logging
+
+# answers are terminated by carriage returns
+END = ord('\r')
+# bytes before and between the words of an answer, e.g. the LF of CRLF
+WHITESPACE = b' \t\n\r\x0b\x0c'
+SPACE = ord(' ')
+
+
+class AnswerParser(object):
+    """Splits received bytes into answers and calls the handler registered
+    for their first word, e.g. ST.
+
+    Received bytes are appended to one buffer, which is scanned in place
+    and only compacted once per feed. Handlers get a memoryview of the
+    answer without leading whitespace, which is released after the
+    call."""
+
+    def __init__(self, handlers=None):
+        """Initialization with dict <first word bytes, handler>."""
+        self.handlers = {}
+        # (prefix, handler) for answers whose first word varies
+        self.prefixes = []
+        self.__buf = bytearray()
+        self.answers = 0
+        for word, handler in (handlers or {}).items():
+            self.register(word, handler)
+
+    def register(self, word, handler, prefix=False):
+        """Calls handler for every answer whose first word is word, or
+        starts with it if prefix is set (e.g. b'RS' for RSIX800O00)."""
+        if prefix:
+            self.prefixes.append((bytes(word), handler))
+        else:
+            self.handlers[bytes(word)] = handler
+
+    def handler(self, word):
+        """Returns the handler for an answer's first word or None."""
+        handler = self.handlers.get(word)
+        if handler is None:
+            for prefix, candidate in self.prefixes:
+                if word.startswith(prefix):
+                    return candidate
+        return handler
+
+    def feed(self, data):
+        """Handles all complete answers in the received bytes."""
+        buf = self.__buf
+        buf += data
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        start = 0
+        with memoryview(buf) as view:
+            end = buf.find(END, start)
+            while end >= 0:
+                while start < end and buf[start] in WHITESPACE:
+                    start += 1
+                if start < end:
+                    self.answers += 1
+                    if debug:
+                        logging.debug('read: %s' % view[start:end].tobytes()
+                                      .decode('latin-1'))
+                    space = buf.find(SPACE, start, end)
+                    handler = self.handler(view[start:end if space < 0
+                                                else space].tobytes())
+                    if handler is not None:
+                        answer = view[start:end]
+                        handler(answer)
+                        answer.release()
+                start = end + 1
+                end = buf.find(END, start)
+        if start:
+            del buf[:start]
+
+    def pending(self):
+        """Returns the bytes of an incomplete answer."""
+        return bytes(self.__buf)
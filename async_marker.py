@@ -0,0 +1,220 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import time
+import serial
+from job import Job
+from marker import BaseMarker, TILED_ORDERS, load_picture
+from protocol import EMERGENCY_OFF
+
+
+class AsyncMarker(BaseMarker):
+    """Borries marker driven by an asyncio event loop.
+
+    Commands are awaitable and resolve once the controller acknowledged
+    them with its ST answers. Call start() to attach to the loop."""
+
+    # seconds without writes before a heartbeat is sent
+    heartbeat_interval = .1
+
+    def __init__(self, device, slow_motion=False, window=4, loop=None,
+                 job_cache=None, workers=None, batch_bytes=None):
+        """Initializes marker and queues moving to home position."""
+        # producers must never block the loop, so the queue is unbounded
+        BaseMarker.__init__(self, high_water=float('inf'), window=window,
+                            job_cache=job_cache, workers=workers,
+                            batch_bytes=batch_bytes)
+        self.loop = loop or asyncio.get_event_loop()
+        self.__serial = serial.Serial(device, timeout=0)
+        # <ST count done, future> in order of the commands
+        self.__waiting = collections.deque()
+        self.__writing = False
+        self.__last_write = 0
+        self.__heartbeat = None
+        self.__home = self.initialize(slow_motion)
+
+    def start(self):
+        """Starts reading and writing on the event loop. Returns a future
+        which resolves when init and homing are done."""
+        self.queue.on_change = lambda: self.loop.call_soon_threadsafe(
+            self.__update_writer)
+        self.loop.add_reader(self.__serial.fileno(), self.__on_readable)
+        self.__update_writer()
+        self.__schedule_heartbeat()
+        return self.__home
+
+    def close(self):
+        """Detaches from the event loop and closes the port."""
+        self.queue.on_change = None
+        if self.__heartbeat is not None:
+            self.__heartbeat.cancel()
+        self._export_metrics(force=True)
+        self._save_checkpoint(force=True)
+        self.loop.remove_reader(self.__serial.fileno())
+        if self.__writing:
+            self.loop.remove_writer(self.__serial.fileno())
+            self.__writing = False
+        self.__serial.close()
+
+    def _send(self, commands, acks):
+        """Queues commands, returns future resolving on their answers."""
+        BaseMarker._send(self, commands, acks)
+        return self.__expect()
+
+    def _send_job(self, job):
+        """Queues a job, returns future resolving on its last answer."""
+        BaseMarker._send_job(self, job)
+        return self.__expect()
+
+    def __expect(self):
+        """Returns future resolving when all queued commands are done."""
+        future = self.loop.create_future()
+        self.__waiting.append((self.count['ST'].tbd, future))
+        self.__resolve()
+        return future
+
+    def __resolve(self):
+        """Resolves futures of acknowledged commands."""
+        done = self.count['ST'].done
+        while self.__waiting and self.__waiting[0][0] <= done:
+            _, future = self.__waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+
+    def __on_readable(self):
+        """Handles answers from the controller."""
+        self.feed(self.__serial.read(102400))
+        self.__resolve()
+        # answers open the window again
+        self.__update_writer()
+
+    def __update_writer(self):
+        """Waits for the port to be writable while there is something to
+        send and the controller has room for more commands."""
+        sendable = bool(len(self.queue)) and self.in_flight() < self.window
+        if sendable and not self.__writing:
+            self.loop.add_writer(self.__serial.fileno(), self.__on_writable)
+        elif not sendable and self.__writing:
+            self.loop.remove_writer(self.__serial.fileno())
+        self.__writing = sendable
+
+    def __on_writable(self):
+        """Sends the next datagram."""
+        datagram = self._next_datagram()
+        if datagram is not None:
+            self.__serial.write(datagram)
+            self._written(datagram)
+            self.__last_write = time.time()
+        self.__update_writer()
+
+    def __schedule_heartbeat(self):
+        """Sends a heartbeat if nothing was written for a while."""
+        idle = time.time() - self.__last_write
+        if idle >= self.heartbeat_interval and not self.queue:
+            self.queue.put(';*SH;;*SH;', block=False)
+            self.__update_writer()
+            idle = 0
+        self._export_metrics()
+        self._save_checkpoint()
+        self.__heartbeat = self.loop.call_later(
+            max(self.heartbeat_interval - idle, 0),
+            self.__schedule_heartbeat)
+
+    def _emergency_off(self, err):
+        """Sends emergency off sequence and fails all waiting commands."""
+        # do not use write buffer, send directly
+        self.__serial.write(EMERGENCY_OFF.encode())
+        self.__serial.flush()
+        while self.__waiting:
+            _, future = self.__waiting.popleft()
+            if not future.done():
+                future.set_exception(Exception(str(err)))
+
+    def load_picture(self, image_file, bounding_box, granularity=5,
+                     dither=True, threshold=128):
+        """Returns the (N, 2) array of needle points in mm for an image in
+        the given bounding box. It runs in the loop's executor, so a too
+        low resolution is not asked about on the console."""
+        return load_picture(image_file, bounding_box, granularity, dither,
+                            threshold)
+
+    async def __wait(self, future):
+        """Waits for future unless the command was not sent at all."""
+        if future is not None:
+            await future
+
+    async def home(self):
+        """Moves to home position and resets position counter."""
+        await self.__wait(BaseMarker.home(self))
+
+    async def move_rel(self, x, y):
+        """Moves to given relative position."""
+        await self.__wait(BaseMarker.move_rel(self, x, y))
+
+    async def move_abs(self, x, y):
+        """Moves to given absolute position."""
+        await self.__wait(BaseMarker.move_abs(self, x, y))
+
+    async def needle_down(self):
+        """Moves the needle marking unit down."""
+        await self.__wait(BaseMarker.needle_down(self))
+
+    async def mark_picture(self, image_file, bounding_box, granularity=5,
+                           order='2opt', dither=True, threshold=128,
+                           max_run=1):
+        """Marks an image in the given bounding box (see
+        Marker.mark_picture). Compiling runs in the loop's executor."""
+        if self.job_cache is not None or order not in TILED_ORDERS:
+            job = await self.loop.run_in_executor(
+                None, self.compile_picture, image_file, bounding_box,
+                granularity, order, dither, threshold, max_run)
+            await self.__wait(self.mark_job(job))
+            return
+        points = await self.loop.run_in_executor(
+            None, self.load_picture, image_file, bounding_box, granularity,
+            dither, threshold)
+        paths = BaseMarker.tiled_paths(self, points, order)
+        sent = None
+        while True:
+            path = await self.loop.run_in_executor(None, next, paths, None)
+            if path is None:
+                break
+            sent = self.mark_job(Job(path, self.position(), max_run))
+        await self.__wait(sent)
+
+    async def mark_batch(self, items, granularity=5, order='2opt',
+                         dither=True, threshold=128, max_run=1):
+        """Marks several images as one job (see Marker.compile_batch).
+        Compiling runs in the loop's executor."""
+        job = await self.loop.run_in_executor(
+            None, self.compile_batch, items, granularity, order, dither,
+            threshold, max_run)
+        await self.__wait(self.mark_job(job))
+
+    async def mark_points(self, points, order='2opt', max_run=1):
+        """Marks the (N, 2) array of needle points in mm. Ordering runs in
+        the loop's executor."""
+        job = await self.loop.run_in_executor(None, self.plan, points, order,
+                                              max_run)
+        await self.__wait(self.mark_job(job))
+
+    async def resume(self, job, checkpoint_file=None):
+        """Homes and marks the rest of an interrupted Job (see
+        Marker.resume)."""
+        await self.__wait(BaseMarker.resume(self, job, checkpoint_file))
+
+    async def mark_polylines(self, polylines, pitch=.2, max_run=1,
+                             reorder=True):
+        """Marks polylines in mm with dots every pitch mm (see
+        Marker.mark_polylines)."""
+        await self.__wait(BaseMarker.mark_polylines(self, polylines, pitch,
+                                                    max_run, reorder))
+
+    async def mark_svg(self, svg_file, bounding_box, pitch=.2, max_run=1,
+                       reorder=True):
+        """Marks the shapes of an SVG file along their outlines (see
+        Marker.mark_svg)."""
+        await self.__wait(BaseMarker.mark_svg(self, svg_file, bounding_box,
+                                              pitch, max_run, reorder))
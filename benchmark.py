@@ -0,0 +1,208 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import planner
+import preview
+import raster
+from cmdqueue import CommandQueue
+from emulator import Emulator
+from job import Job
+from marker import BaseMarker, Marker
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+# <name, bounding box, granularities> of the images to benchmark, 'plate'
+# is a synthetic gray image covering the whole plate
+IMAGES = (
+    ('Logo_quadratisch.png', (0, 0, 30, 30), (2, 5, 10)),
+    ('Logo_quadratisch.png', (0, 0, 100, 100), (2, 5, 10)),
+    ('plate', (0, 0, BaseMarker.MAX_X, BaseMarker.MAX_Y), (2, 5)),
+)
+# preview resolutions in pixels per mm
+RESOLUTIONS = (10, 50)
+# end-to-end runs through the emulator are limited to smaller jobs
+MAX_E2E_POINTS = 20000
+# end-to-end runs with one datagram per write and with batched writes
+BATCH_BYTES = (None, 128)
+
+
+def plate_image(bounding_box, granularity):
+    """Returns a synthetic gray gradient image with twice the raster
+    resolution of the bounding box."""
+    width, height = raster.raster_size(bounding_box, granularity)
+    x = np.linspace(0, 1, 2 * width)
+    y = np.linspace(0, 1, 2 * height)[:, None]
+    gray = (127.5 + 127.5 * np.sin(8 * x) * np.cos(6 * y)).astype(np.uint8)
+    return Image.fromarray(gray, 'L')
+
+
+def open_image(name, bounding_box, granularity):
+    """Returns the benchmark image called name."""
+    if name == 'plate':
+        return plate_image(bounding_box, granularity)
+    return Image.open(name)
+
+
+def timed(function, *args):
+    """Returns result of function and its run time."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function, *args):
+    """Returns peak of memory in MB allocated while running function.
+    Tracing slows Python code down, so this is a separate run."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] / 2.0 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def encode(job):
+    """Encodes a job into datagrams, returns number of datagrams and
+    bytes."""
+    queue = CommandQueue(float('inf'))
+    queue.put_stream(job, 2)
+    datagrams = size = 0
+    while True:
+        datagram = queue.get()
+        if datagram is None:
+            return datagrams, size
+        datagrams += 1
+        size += len(datagram)
+
+
+def mark(job, window=4, batch_bytes=None, timeout=600):
+    """Marks job on an emulator with virtual clock, returns the sender's
+    queue statistics and the simulated machine time."""
+    emulator = Emulator()
+    emulator.start()
+    marker = Marker(emulator.device, window=window, batch_bytes=batch_bytes)
+    count = marker.count['ST']
+    # logging every answer would be measured as well
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    marker.start()
+    try:
+        marker.mark_job(job)
+        start = time.time()
+        while count.done < count.tbd:
+            if time.time() - start > timeout:
+                raise Exception('Emulator run timed out.')
+            time.sleep(.005)
+        return marker.queue.stats(), emulator.clock
+    finally:
+        logging.getLogger().setLevel(level)
+        marker.running = False
+        marker.join()
+        emulator.stop()
+
+
+def run(images=IMAGES, resolutions=RESOLUTIONS, order='2opt'):
+    """Runs all benchmarks and returns list of result dicts."""
+    results = []
+    for name, bounding_box, granularities in images:
+        for granularity in granularities:
+            case = {'image': name, 'bounding_box': list(bounding_box),
+                    'granularity': granularity}
+            with open_image(name, bounding_box, granularity) as img:
+                args = (img, bounding_box, granularity)
+                points, seconds = timed(raster.rasterize, *args)
+                peak = peak_memory(raster.rasterize, *args)
+            results.append(dict(case, benchmark='rasterize',
+                                points=len(points), seconds=seconds,
+                                peak_mb=peak))
+
+            ordered, seconds = timed(planner.order_points, points, order)
+            results.append(dict(case, benchmark='order', order=order,
+                                seconds=seconds))
+
+            (datagrams, size), seconds = timed(encode, Job(ordered,
+                                                           max_run=8))
+            results.append(dict(case, benchmark='encode', seconds=seconds,
+                                datagrams=datagrams,
+                                datagrams_per_second=datagrams / seconds,
+                                bytes_per_second=size / seconds))
+
+            for resolution in resolutions:
+                args = (ordered, (BaseMarker.MAX_X, BaseMarker.MAX_Y),
+                        resolution, 0, 'L')
+                _, seconds = timed(preview.render, *args)
+                results.append(dict(case, benchmark='preview',
+                                    resolution=resolution, seconds=seconds,
+                                    peak_mb=peak_memory(preview.render,
+                                                        *args)))
+
+            for batch_bytes in BATCH_BYTES:
+                if len(ordered) > MAX_E2E_POINTS:
+                    break
+                start = time.perf_counter()
+                stats, clock = mark(Job(ordered, max_run=8),
+                                    batch_bytes=batch_bytes)
+                seconds = time.perf_counter() - start
+                results.append(dict(
+                    case, benchmark='mark', batch_bytes=batch_bytes,
+                    seconds=seconds, datagrams=stats['datagrams_out'],
+                    writes=stats['writes'],
+                    datagrams_per_second=stats['datagrams_out'] / seconds,
+                    bytes_per_second=stats['bytes_out'] / seconds,
+                    machine_seconds=clock))
+            logging.info('%s %s @ %d/mm: %d points' % (
+                name, bounding_box, granularity, len(points)))
+    return results
+
+
+def key(result):
+    """Returns what identifies a benchmark case across runs."""
+    return (result['benchmark'], result['image'],
+            tuple(result['bounding_box']), result['granularity'],
+            result.get('resolution'), result.get('batch_bytes'))
+
+
+def compare(old_file, new_file):
+    """Logs the run time of every case of new_file relative to old_file."""
+    with open(old_file) as json_file:
+        old = {key(r): r for r in json.load(json_file)['results']}
+    with open(new_file) as json_file:
+        new = json.load(json_file)['results']
+    for result in new:
+        if key(result) in old:
+            logging.info('%-9s %-20s %-22s %2d/mm %4s: %8.3fs %+7.1f%%' % (
+                key(result)[:4] + (result.get('resolution') or '',
+                                   result['seconds'],
+                                   (result['seconds'] /
+                                    old[key(result)]['seconds'] - 1) * 100)))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)-8s %(message)s',
+                        datefmt='%H:%M:%S')
+    if len(sys.argv) == 4 and sys.argv[1] == 'compare':
+        compare(sys.argv[2], sys.argv[3])
+        sys.exit()
+    if len(sys.argv) > 2:
+        sys.exit('usage: %s [<results.json>]\n'
+                 '       %s compare <old.json> <new.json>' % (sys.argv[0],
+                                                             sys.argv[0]))
+    output = sys.argv[1] if len(sys.argv) == 2 else 'benchmark.json'
+    results = run()
+    with open(output, 'w') as json_file:
+        json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'python': platform.python_version(),
+                   'numpy': np.__version__,
+                   'machine': platform.machine(),
+                   'results': results}, json_file, indent=2)
+    logging.info('results written to %s' % output)
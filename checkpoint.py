@@ -0,0 +1,52 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+# points hashed at a time
+KEY_CHUNK = 1 << 16
+
+
+def job_key(job):
+    """Returns hex digest identifying a Job's points and strokes, equal for
+    the same job loaded from a job file or the job cache."""
+    digest = hashlib.sha1()
+    for start in range(0, len(job), KEY_CHUNK):
+        digest.update(np.asarray(job.positions[start:start + KEY_CHUNK],
+                                 dtype='<i8').tobytes())
+    digest.update(np.asarray(job.runs).astype('<i8').tobytes())
+    return digest.hexdigest()
+
+
+def progress(job, acks):
+    """Returns index of the first point of a Job whose stroke was not
+    acknowledged after acks of its answers, counted like Job.acks."""
+    strokes = min(max(int(acks // 2), 0), len(job.runs))
+    return int(job.runs[strokes]) if strokes < len(job.runs) else len(job)
+
+
+def save(path, key, point, points):
+    """Writes atomically that the job with key (see job_key) of points
+    points was acknowledged up to point index point."""
+    state = {'job': key, 'point': point, 'points': points,
+             'time': time.time()}
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as checkpoint_file:
+        json.dump(state, checkpoint_file)
+    os.replace(tmp, path)
+
+
+def load(path, job):
+    """Returns the point index a Job is to be resumed at. Checkpoints of
+    other jobs are refused."""
+    with open(path) as checkpoint_file:
+        state = json.load(checkpoint_file)
+    if state['job'] != job_key(job):
+        raise Exception('%s is the checkpoint of another job.' % path)
+    return state['point']
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+import time
+from protocol import ACKNOWLEDGED
+
+
+class QueueClosed(Exception):
+    """Raised when commands are put into a closed queue."""
+
+
+class Datagram(bytes):
+    """Encoded datagram knowing how many answers it completes."""
+    # commands completed by this datagram, counted like SerialAnswer.tbd
+    acks = 0
+
+
+class CommandQueue(object):
+    """Bounded FIFO of encoded datagrams waiting to be sent.
+
+    Commands are split into ';;' delimited datagrams on put, so the sender
+    only pops ready byte strings. A command's trailing part without ';;'
+    is kept back until the next put completes it, like the former string
+    write buffer did. put blocks while high_water datagrams are queued.
+
+    Streams of commands (e.g. a Job) are only pulled when the sender gets
+    to them. Commands put after a stream are kept as they are until the
+    stream is exhausted to preserve their order.
+
+    Every put names the number of answers its commands are acknowledged
+    with. Each datagram carries one of them per acknowledged command in it,
+    the rest goes with the datagram the commands end in, so the sender
+    knows when to expect them."""
+
+    def __init__(self, high_water=1024, lock=None):
+        """Initialization with maximum number of queued datagrams and the
+        lock guarding the queue, by default an RLock (e.g. a
+        metrics.TimedLock)."""
+        self.high_water = high_water
+        self.closed = False
+        # encoded datagrams and command streams
+        self.__datagrams = collections.deque()
+        self.__streams = 0
+        self.__tail = ''
+        self.__tail_acks = 0
+        self.__cond = threading.Condition(lock)
+        # called when the empty queue got items or the queue got closed
+        self.on_change = None
+
+        # throughput counters
+        self.datagrams_in = 0
+        self.datagrams_out = 0
+        self.writes = 0
+        self.bytes_out = 0
+        self.start_time = None
+
+    def __len__(self):
+        """Number of queued datagrams and streams."""
+        return len(self.__datagrams)
+
+    def __wait(self, block):
+        """Waits until there is room for another item."""
+        while block and not self.closed and \
+                len(self.__datagrams) >= self.high_water:
+            self.__cond.wait()
+        if self.closed:
+            raise QueueClosed('Command queue closed.')
+
+    def __changed(self):
+        """Notifies the sender about new items or closing."""
+        if self.on_change is not None:
+            self.on_change()
+
+    def __split(self, commands, acks):
+        """Returns complete datagrams of commands, keeps back the tail."""
+        parts = (self.__tail + commands).split(';;')
+        self.__tail = parts.pop()
+        datagrams = [Datagram((';%s;' % part).encode()) for part in parts]
+        carried = self.__tail_acks + acks
+        for datagram, part in zip(datagrams, parts):
+            datagram.acks = min(carried, sum(part.count(command)
+                                             for command in ACKNOWLEDGED))
+            carried -= datagram.acks
+        if datagrams and carried > acks:
+            # the rest of the former tail ends in the first datagram
+            datagrams[0].acks += carried - acks
+            carried = acks
+        self.__tail_acks = carried
+        return datagrams
+
+    def put(self, commands, acks=0, block=True):
+        """Splits commands into datagrams and queues them, waiting for the
+        sender while the queue is full."""
+        with self.__cond:
+            if self.__streams:
+                # split when the sender gets here, after the streams
+                self.put_stream([commands], acks, block)
+                return
+            for datagram in self.__split(commands, acks):
+                self.__wait(block)
+                self.__datagrams.append(datagram)
+                self.datagrams_in += 1
+                if len(self.__datagrams) == 1:
+                    self.__changed()
+
+    def put_stream(self, commands, acks=0, block=True):
+        """Queues an iterable of commands, which is pulled lazily. Each
+        command is acknowledged with acks answers."""
+        with self.__cond:
+            self.__wait(block)
+            self.__datagrams.append(_Stream(commands, acks))
+            self.__streams += 1
+            if len(self.__datagrams) == 1:
+                self.__changed()
+
+    def __head(self):
+        """Returns the first Datagram, pulling streams as needed, or None
+        if there is none."""
+        while self.__datagrams:
+            item = self.__datagrams[0]
+            if isinstance(item, bytes):
+                return item
+            try:
+                commands = next(item)
+            except StopIteration:
+                self.__datagrams.popleft()
+                self.__streams -= 1
+                continue
+            # datagrams of the stream go before the rest of it
+            datagrams = self.__split(commands, item.acks)
+            for datagram in reversed(datagrams):
+                self.__datagrams.appendleft(datagram)
+            self.datagrams_in += len(datagrams)
+        return None
+
+    def get(self, max_bytes=0, max_acks=0):
+        """Returns next Datagram or None if there is none. With max_bytes,
+        the following datagrams are joined into it as long as it stays
+        within max_bytes and max_acks answers, so they go out in one
+        write."""
+        with self.__cond:
+            datagram = self.__head()
+            if datagram is None:
+                return None
+            self.__datagrams.popleft()
+            count = 1
+            if max_bytes:
+                parts = [datagram]
+                size = len(datagram)
+                acks = datagram.acks
+                following = self.__head()
+                while following is not None and \
+                        size + len(following) <= max_bytes and \
+                        acks + following.acks <= max_acks:
+                    self.__datagrams.popleft()
+                    parts.append(following)
+                    size += len(following)
+                    acks += following.acks
+                    following = self.__head()
+                if len(parts) > 1:
+                    datagram = Datagram(b''.join(parts))
+                    datagram.acks = acks
+                    count = len(parts)
+
+            if self.start_time is None:
+                self.start_time = time.time()
+            self.datagrams_out += count
+            self.writes += 1
+            self.bytes_out += len(datagram)
+            self.__cond.notify_all()
+            return datagram
+
+    def close(self):
+        """Drops all queued datagrams and wakes up blocked producers."""
+        with self.__cond:
+            self.closed = True
+            self.__datagrams.clear()
+            self.__streams = 0
+            self.__tail = ''
+            self.__tail_acks = 0
+            self.__cond.notify_all()
+            self.__changed()
+
+    def pending(self):
+        """Returns all queued commands as one string."""
+        return ''.join(part if isinstance(part, str) else part.pending()
+                       for part in self.pending_parts())
+
+    def pending_parts(self):
+        """Returns all queued commands as list of strings and the command
+        streams (e.g. Jobs) which provide them, in order."""
+        with self.__cond:
+            parts = []
+            tail = self.__tail
+            for item in self.__datagrams:
+                if isinstance(item, bytes):
+                    # strip the datagram's framing again
+                    parts.append(item.decode()[1:-1] + ';;')
+                else:
+                    # the tail kept back precedes the first stream
+                    parts.append(tail)
+                    parts.append(item.source())
+                    tail = ''
+            parts.append(tail)
+            return parts
+
+    def stats(self):
+        """Returns queue depth and throughput counters as dict."""
+        with self.__cond:
+            runtime = time.time() - self.start_time if self.start_time \
+                else 0
+            return {
+                'depth': len(self.__datagrams),
+                'high_water': self.high_water,
+                'datagrams_in': self.datagrams_in,
+                'datagrams_out': self.datagrams_out,
+                'writes': self.writes,
+                'bytes_out': self.bytes_out,
+                'datagrams_per_second': self.datagrams_out / runtime
+                if runtime else 0.0,
+                'bytes_per_second': self.bytes_out / runtime
+                if runtime else 0.0,
+            }
+
+
+class _Stream(object):
+    """Lazily pulled iterable of commands."""
+
+    def __init__(self, commands, acks=0):
+        """Initialization with iterable of command strings and the answers
+        each of them is acknowledged with."""
+        self.commands = commands
+        self.acks = acks
+        self.iterator = iter(commands)
+        self.pulled = 0
+
+    def __next__(self):
+        """Returns next command string."""
+        commands = next(self.iterator)
+        self.pulled += 1
+        return commands
+
+    def source(self):
+        """Returns the stream's commands not pulled yet, as string unless
+        they come from an object knowing its pending commands."""
+        if hasattr(self.commands, 'pending'):
+            return self.commands
+        if isinstance(self.commands, (list, tuple)):
+            return ''.join(self.commands[self.pulled:])
+        return ''
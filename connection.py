@@ -0,0 +1,118 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from marker import Marker
+
+
+class ConnectionManager(object):
+    """Keeps a Marker connected across jobs and reconnects without setting
+    the controller up again if it still is.
+
+    After INIT the manager remembers the controller's heartbeat answer
+    (RSIX...) and the speed INIT applied. The status bits are not
+    documented, so the answer is only trusted if it changed with INIT.
+    When the session has to be opened again, INIT is only sent if the
+    heartbeat answer differs or is not trusted, the last session ended
+    with an emergency off, or other parameters are asked for. HOME is only
+    sent if the position is unknown because commands were not
+    acknowledged when the session ended."""
+    # False sends INIT for every new session
+    trust_status = True
+    # seconds to wait for the first heartbeat answer of a session
+    probe_timeout = 2.0
+    # seconds to wait for INIT and HOME to be answered
+    setup_timeout = 60.0
+
+    def __init__(self, device, log_level=logging.INFO, **options):
+        """Initialization with the device and Marker options (e.g.
+        window)."""
+        self.device = device
+        self.log_level = log_level
+        self.options = options
+        self.marker = None
+        # heartbeat answer of the set up controller, None if it does not
+        # tell, and slow_motion of the INIT it got
+        self.ready_status = None
+        self.applied = None
+        self.setups = 0
+
+    def connect(self, slow_motion=False):
+        """Returns the running Marker, set up for slow_motion. Opens a new
+        session if there is none or the last one ended."""
+        marker = self.marker
+        if marker is not None and marker.running and \
+                not marker.queue.closed and marker.is_alive():
+            if slow_motion != self.applied:
+                self.__setup(marker, slow_motion, marker.status)
+            return marker
+
+        position = None
+        halted = False
+        if marker is not None:
+            # emergency off closes the queue
+            halted = marker.queue.closed
+            count = marker.count['ST']
+            if count.done >= count.tbd:
+                position = marker.position()
+            marker.close()
+
+        marker = self.marker = Marker(self.device, slow_motion,
+                                      self.log_level, setup=False,
+                                      **self.options)
+        marker.start()
+        status = self.__wait_status(marker, 0, self.probe_timeout)
+        if halted or not self.trust_status or status is None or \
+                status != self.ready_status or slow_motion != self.applied:
+            self.__setup(marker, slow_motion, status)
+        elif position is None:
+            logging.info('%s still set up, position lost.' % self.device)
+            marker.restore((0, 0), slow_motion)
+            marker.home()
+            self.__wait_done(marker)
+        else:
+            logging.info('%s still set up at (%.2f, %.2f).' % (
+                (self.device,) + position))
+            marker.restore(position, slow_motion)
+        return marker
+
+    def __setup(self, marker, slow_motion, status):
+        """Sends INIT and HOME and learns the set up heartbeat answer if it
+        differs from the answer status before."""
+        logging.info('Setting up %s.' % self.device)
+        marker.initialize(slow_motion)
+        self.__wait_done(marker)
+        ready = self.__wait_status(marker, time.time(), self.probe_timeout)
+        if ready != status:
+            self.ready_status = ready
+        elif ready != self.ready_status:
+            # the controller answered the same before and after INIT
+            logging.info('%s does not report its setup.' % self.device)
+            self.ready_status = None
+        self.applied = slow_motion
+        self.setups += 1
+
+    def __wait_done(self, marker):
+        """Waits until all commands of marker were answered."""
+        count = marker.count['ST']
+        end = time.time() + self.setup_timeout
+        while count.done < count.tbd:
+            if time.time() > end or not marker.is_alive():
+                raise Exception('%s: setup not answered.' % self.device)
+            time.sleep(.01)
+
+    def __wait_status(self, marker, since, timeout):
+        """Returns the first heartbeat answer received after since, None
+        if there is none within timeout seconds."""
+        end = time.time() + timeout
+        while marker.status_time <= since:
+            if time.time() > end or not marker.is_alive():
+                return None
+            time.sleep(.01)
+        return marker.status
+
+    def close(self):
+        """Ends the session."""
+        if self.marker is not None:
+            self.marker.close()
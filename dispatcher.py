@@ -0,0 +1,153 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import collections
+import concurrent.futures
+import logging
+import threading
+import jobcache
+from marker import Marker, compile_picture
+
+
+class Dispatcher(threading.Thread):
+    """Marks jobs on a pool of machines.
+
+    Jobs are compiled in a process pool as soon as they are submitted and
+    sent to the next idle machine in submission order. A machine is idle
+    when all its commands were acknowledged."""
+    daemon = True
+    running = True
+
+    # seconds between checks of the machines' answer counts
+    poll_interval = .05
+
+    def __init__(self, devices, slow_motion=False, workers=None,
+                 job_cache=None, log_level=logging.INFO):
+        """Connects to all devices and starts a process pool of workers
+        processes (default: one per CPU)."""
+        threading.Thread.__init__(self)
+        self.slow_motion = slow_motion
+        self.job_cache = job_cache
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers)
+        self.markers = [Marker(device, slow_motion, log_level)
+                        for device in devices]
+        # <marker, (future, answers to wait for)> of running jobs
+        self.__running = {}
+        self.__failed = set()
+        # (compiled job future, result future) in submission order
+        self.__pending = collections.deque()
+        self.__cond = threading.Condition()
+        for marker in self.markers:
+            marker.start()
+
+    def submit(self, image_file, bounding_box, granularity=5, order='2opt',
+               dither=True, threshold=128, max_run=1):
+        """Queues an image for marking (see Marker.mark_picture). Returns a
+        future resolving to the device which marked it."""
+        params = (image_file, bounding_box, granularity, order, dither,
+                  threshold, max_run)
+        key = None
+        compiled = None
+        if self.job_cache is not None:
+            key = jobcache.picture_key(image_file, bounding_box, granularity,
+                                       self.slow_motion, order, dither,
+                                       threshold, max_run)
+            job = self.job_cache.job(key, max_run)
+            if job is not None:
+                compiled = concurrent.futures.Future()
+                compiled.set_result(job)
+        if compiled is None:
+            compiled = self.executor.submit(compile_picture, *params)
+            if key is not None:
+                compiled.add_done_callback(
+                    lambda future: self.__remember(key, future))
+
+        result = concurrent.futures.Future()
+        with self.__cond:
+            self.__pending.append((compiled, result))
+        compiled.add_done_callback(lambda future: self.__wake())
+        return result
+
+    def __remember(self, key, future):
+        """Stores a compiled job in the job cache."""
+        if not future.cancelled() and future.exception() is None:
+            job = future.result()
+            self.job_cache.put(key, job.points, job.runs)
+
+    def __wake(self):
+        """Lets the dispatcher check for work at once."""
+        with self.__cond:
+            self.__cond.notify()
+
+    def idle(self, marker):
+        """True if marker is connected and has acknowledged everything."""
+        count = marker.count['ST']
+        return marker not in self.__running and \
+            marker not in self.__failed and count.done >= count.tbd
+
+    def status(self):
+        """Returns list of dicts with device, state, answer count and
+        predicted seconds left per machine."""
+        with self.__cond:
+            return [{'device': marker.device,
+                     'state': 'failed' if marker in self.__failed else
+                     'marking' if marker in self.__running else
+                     'idle' if self.idle(marker) else 'busy',
+                     'answers': str(marker.count['ST']),
+                     'remaining': marker.estimate()}
+                    for marker in self.markers]
+
+    def __check_running(self):
+        """Resolves the futures of finished jobs."""
+        for marker, (future, answers) in list(self.__running.items()):
+            if not marker.is_alive():
+                self.__failed.add(marker)
+                del self.__running[marker]
+                future.set_exception(Exception('%s disconnected.' %
+                                               marker.device))
+            elif marker.count['ST'].done >= answers:
+                del self.__running[marker]
+                future.set_result(marker.device)
+
+    def __dispatch(self):
+        """Sends compiled jobs to idle machines in submission order."""
+        while self.__pending and self.__pending[0][0].done():
+            compiled, result = self.__pending[0]
+            if compiled.exception() is not None:
+                self.__pending.popleft()
+                result.set_exception(compiled.exception())
+                continue
+            idle = [marker for marker in self.markers if self.idle(marker)]
+            if not idle:
+                return
+            self.__pending.popleft()
+            marker = idle[0]
+            try:
+                marker.mark_job(compiled.result())
+            except Exception as e:
+                # e.g. out of bounds, the machine is off now
+                self.__failed.add(marker)
+                result.set_exception(e)
+                continue
+            self.__running[marker] = (result, marker.count['ST'].tbd)
+            logging.info('%s: job started.' % marker.device)
+
+    def run(self):
+        """Thread loop."""
+        with self.__cond:
+            while self.running:
+                self.__check_running()
+                self.__dispatch()
+                self.__cond.wait(self.poll_interval)
+
+    def close(self):
+        """Stops dispatching, the markers and the process pool."""
+        with self.__cond:
+            self.running = False
+            self.__cond.notify()
+        if self.is_alive():
+            self.join()
+        for marker in self.markers:
+            marker.running = False
+            marker.join()
+        self.executor.shutdown()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import contextlib
+import logging
+import time
+from emulator import Emulator
+from marker import Marker
+
+
+@contextlib.contextmanager
+def emulated(speed=None, marker_class=Marker, **options):
+    """Starts an Emulator (see Emulator speed) and a Marker connected to
+    it, yields both and closes them. options are passed to marker_class."""
+    options.setdefault('log_level', logging.INFO)
+    emulator = Emulator(speed)
+    emulator.start()
+    try:
+        marker = marker_class(emulator.device, **options)
+        marker.start()
+        try:
+            yield emulator, marker
+        finally:
+            marker.close()
+    finally:
+        emulator.stop()
+
+
+def connect(test, speed=None, marker_class=Marker, **options):
+    """Starts an emulated Marker for a unittest.TestCase, which closes it
+    on cleanup. Returns the Emulator and the Marker."""
+    context = emulated(speed, marker_class, **options)
+    emulator, marker = context.__enter__()
+    test.addCleanup(context.__exit__, None, None, None)
+    return emulator, marker
+
+
+def wait_answered(marker, timeout=10):
+    """Waits until all of marker's commands are answered, at most timeout
+    seconds. Returns True if they are."""
+    count = marker.count['ST']
+    end = time.time() + timeout
+    while count.done < count.tbd and time.time() < end:
+        time.sleep(.01)
+    return count.done >= count.tbd
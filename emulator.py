@@ -0,0 +1,195 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tty
+import serial
+from ioloop import SerialLoop
+from motion import MotionModel, CONTROL
+from protocol import ACKNOWLEDGED
+
+# answers of the controller
+ACK = b'ST 00 XX 00 60 00 00 00 00 00 00 00 00 00\r'
+HEARTBEAT = b'RSIX800O00\r'
+# the status bits are not documented; the emulator answers this until INIT
+# is done, so that reconnecting can tell set up controllers apart
+HEARTBEAT_NOT_READY = b'RSIX000O00\r'
+
+
+class Emulator(threading.Thread):
+    """Emulates a Borries marker on a pseudo terminal.
+
+    Connect a Marker to device. Commands are parsed as they arrive, moves
+    and needle strikes take the time of the motion model (see
+    motion.MotionModel) whose parameters INIT sets. speed scales the time,
+    None runs a virtual clock: every answer is sent right away and clock
+    tells the seconds the real machine would have needed."""
+    daemon = True
+    running = True
+    # heartbeat answer until INIT is done, HEARTBEAT for a controller
+    # whose status does not tell
+    heartbeat_not_ready = HEARTBEAT_NOT_READY
+
+    def __init__(self, speed=None):
+        """Opens the pty pair."""
+        threading.Thread.__init__(self)
+        self.speed = speed
+        master, self.__slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(self.__slave)
+        self.device = os.ttyname(self.__slave)
+        self.__port = os.fdopen(master, 'r+b', buffering=0)
+        self.__loop = SerialLoop(self.__port)
+
+        self.model = MotionModel()
+        self.initialized = False
+        # INIT sequences completed
+        self.setups = 0
+        self.halted = False
+        # position in hundredths of a mm
+        self.__x = self.__y = 0
+        # positions of all needle strikes in mm
+        self.strikes = []
+        self.answers = 0
+        # simulated seconds
+        self.clock = 0.0
+        self.__busy = 0.0
+        self.__started = time.time()
+        self.__buf = ''
+        # <simulated time, answer> in order of the commands
+        self.__scheduled = collections.deque()
+
+    def position(self):
+        """Head position in mm."""
+        return self.__x / 100.0, self.__y / 100.0
+
+    def now(self):
+        """Current simulated time in seconds."""
+        if self.speed is None:
+            return self.clock
+        return (time.time() - self.__started) * self.speed
+
+    def feed(self, data):
+        """Executes the complete commands in received bytes."""
+        self.__buf += data.decode('latin-1')
+        *commands, self.__buf = self.__buf.split(';')
+        # the controller idles until the first of these commands arrives
+        self.__busy = max(self.__busy, self.now())
+        for command in commands:
+            command = command.strip(CONTROL)
+            if command:
+                self.execute(command)
+
+    def execute(self, command):
+        """Executes a single command."""
+        if command == '*SH':
+            # status requests are answered at once
+            self.__scheduled.appendleft((0, HEARTBEAT if self.initialized
+                                         else self.heartbeat_not_ready))
+            return
+        if command == '*HE':
+            logging.debug('EMU: emergency off')
+            self.halted = True
+            self.initialized = False
+            self.__scheduled.clear()
+            return
+        if command == '*SQ':
+            # a new INIT starts
+            self.halted = False
+        if self.halted:
+            return
+
+        seconds, position = self.model.duration(command, self.position())
+        self.__busy += seconds
+        self.__x, self.__y = (int(round(v * 100)) for v in position)
+        if command == 'PD':
+            self.strikes.append(self.position())
+        elif command in ACKNOWLEDGED:
+            if command == '*EB':
+                self.initialized = True
+                self.setups += 1
+            self.__scheduled.append((self.__busy, ACK * 2))
+
+    def __flush(self):
+        """Sends all answers which are due and returns the seconds until the
+        next one, or None."""
+        while self.__scheduled:
+            due, answer = self.__scheduled[0]
+            if due > self.now():
+                if self.speed is None:
+                    # nothing happens in between, skip ahead
+                    self.clock = due
+                    continue
+                return (due - self.now()) / self.speed
+            self.__scheduled.popleft()
+            self.__port.write(answer)
+            self.answers += answer.count(b'\r')
+
+    def run(self):
+        """Thread loop."""
+        timeout = None
+        while self.running:
+            readable, _ = self.__loop.wait(timeout=timeout)
+            if readable:
+                self.feed(self.__port.read(4096))
+            timeout = self.__flush()
+            if self.speed is not None:
+                self.clock = self.now()
+        self.__loop.close()
+        self.__port.close()
+        os.close(self.__slave)
+
+    def stop(self):
+        """Stops the emulator and closes the pty pair."""
+        self.running = False
+        self.__loop.wake()
+        self.join()
+
+
+def replay(log_file, speed=None, timeout=60):
+    """Sends a captured session log (e.g. usb-traffic-log/sequences.txt) to
+    an emulator and waits for all answers. Returns simulated seconds and
+    needle strikes."""
+    with open(log_file, 'rb') as log:
+        commands = log.read()
+    acknowledged = [command.encode() for command in ACKNOWLEDGED]
+    expected = sum(command.strip(CONTROL.encode()).strip() in acknowledged
+                   for command in commands.split(b';'))
+
+    emulator = Emulator(speed)
+    emulator.start()
+    port = serial.Serial(emulator.device, timeout=0)
+    buf = b''
+    try:
+        end = time.time() + timeout
+        while buf.count(ACK) < 2 * expected:
+            if time.time() > end:
+                raise Exception('%s: %d of %d answers.' % (
+                    log_file, buf.count(ACK) // 2, expected))
+            if commands:
+                # keep reading, the answers must not fill up the pty
+                commands = commands[port.write(commands[:1024]):]
+            buf += port.read(4096)
+            if not commands:
+                time.sleep(.001)
+        return emulator.clock, emulator.strikes
+    finally:
+        port.close()
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)-8s %(message)s',
+                        datefmt='%H:%M:%S')
+    if len(sys.argv) < 2:
+        sys.exit('usage: %s <session log>...' % sys.argv[0])
+    for log_file in sys.argv[1:]:
+        seconds, strikes = replay(log_file)
+        logging.info('%s: %.2f s, %d needle strikes.' % (log_file, seconds,
+                                                         len(strikes)))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import numpy as np
+from motion import MotionModel
+
+
+class Estimator(object):
+    """Predicts the run time of queued commands from the motion model and
+    corrects the prediction with the observed answer timings.
+
+    Every answer has a predicted duration. While commands run, the time
+    actually passed is compared to the predicted time of the answers
+    received, the remaining time is scaled by that ratio."""
+    # predicted seconds of confidence in the model when blending it with
+    # the observed timings
+    prior = 10.0
+
+    def __init__(self, model=None):
+        """Initialization with a MotionModel, by default for normal
+        speed."""
+        self.model = model or MotionModel()
+        # predicted seconds per answer, in order
+        self.__times = []
+        self.__cumulative = np.zeros(1)
+        self.__dirty = False
+        # add runs on producer threads, the rebuild on the sender
+        self.__lock = threading.Lock()
+        # answers queued so far
+        self.answers = 0
+        # <answers done, time> when the current run started
+        self.__start = None
+        self.scale = 1.0
+
+    def add(self, times):
+        """Adds predicted seconds of further answers."""
+        times = np.asarray(times, dtype=float)
+        if not len(times):
+            return
+        with self.__lock:
+            self.__times.append(times)
+            self.answers += len(times)
+            self.__dirty = True
+
+    def add_commands(self, commands, answers, position=(0, 0)):
+        """Adds a command string acknowledged with answers answers, the
+        whole time is expected for the last one."""
+        times = np.zeros(answers)
+        seconds = self.model.commands_time(commands, position)
+        if answers:
+            times[-1] = seconds
+        self.add(times)
+
+    def add_job(self, job):
+        """Adds the answers of a Job."""
+        self.add(self.model.job_times(job))
+
+    def __predicted(self, done):
+        """Returns predicted seconds until done answers were received."""
+        if self.__dirty:
+            with self.__lock:
+                self.__cumulative = np.concatenate(
+                    ([0], np.cumsum(np.concatenate(self.__times))))
+                self.__times = [np.diff(self.__cumulative)]
+                self.__dirty = False
+        cumulative = self.__cumulative
+        done = min(max(int(done), 0), len(cumulative) - 1)
+        return cumulative[done]
+
+    def total(self):
+        """Predicted seconds for all queued answers."""
+        return float(self.__predicted(self.answers))
+
+    def observe(self, done, now=None):
+        """Takes the time when done answers were received into account."""
+        now = time.time() if now is None else now
+        if self.__start is None or done <= self.__start[0]:
+            # the controller was idle before, start measuring now
+            self.__start = (done, now)
+            return
+        start_done, start_time = self.__start
+        predicted = self.__predicted(done) - self.__predicted(start_done)
+        self.scale = (now - start_time + self.prior) / \
+            (predicted + self.prior)
+        if done >= self.answers:
+            # everything answered, the next answer follows an idle time
+            self.__start = None
+
+    def remaining(self, done):
+        """Predicted seconds until all queued answers are received after
+        done answers."""
+        return float(self.total() - self.__predicted(done)) * self.scale
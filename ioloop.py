@@ -0,0 +1,64 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import fcntl
+import selectors
+
+
+class SerialLoop(object):
+    """Waits for a serial port to become readable or writable.
+
+    Other threads interrupt a wait with wake(), e.g. when new commands were
+    queued, so nothing has to be polled."""
+
+    def __init__(self, serial):
+        """Initialization with an open serial port."""
+        self.serial = serial
+        self.selector = selectors.DefaultSelector()
+        self.__events = selectors.EVENT_READ
+        self.selector.register(serial.fileno(), self.__events, 'serial')
+
+        self.__wake_r, self.__wake_w = os.pipe()
+        for fd in (self.__wake_r, self.__wake_w):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.selector.register(self.__wake_r, selectors.EVENT_READ, 'wake')
+
+    def wake(self):
+        """Interrupts a running or the next wait."""
+        try:
+            os.write(self.__wake_w, b'.')
+        except BlockingIOError:
+            # pipe is full, the loop wakes up anyway
+            pass
+
+    def wait(self, write=False, timeout=None):
+        """Waits until the port is readable (or writable if write is True),
+        wake() was called or timeout seconds passed. Returns tuple of
+        readable and writable flags."""
+        events = selectors.EVENT_READ
+        if write:
+            events |= selectors.EVENT_WRITE
+        if events != self.__events:
+            self.selector.modify(self.serial.fileno(), events, 'serial')
+            self.__events = events
+
+        readable = writable = False
+        for key, mask in self.selector.select(timeout):
+            if key.data == 'wake':
+                try:
+                    while os.read(self.__wake_r, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            else:
+                readable = bool(mask & selectors.EVENT_READ)
+                writable = bool(mask & selectors.EVENT_WRITE)
+        return readable, writable
+
+    def close(self):
+        """Releases selector and wake-up pipe."""
+        self.selector.close()
+        os.close(self.__wake_r)
+        os.close(self.__wake_w)
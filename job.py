@@ -0,0 +1,245 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import re
+import numpy as np
+import planner
+from protocol import MOVE, STROKE, STROKE_STEP, SPEED_CHANGE, SPEED
+
+# strokes encoded at a time, so memory-mapped jobs are read in chunks
+STROKE_CHUNK = 1 << 12
+# relative move or needle strike, in the order the controller executes them
+TOKEN_RE = re.compile(r'\*PR(-?\d+\.\d\d),(-?\d+\.\d\d)|(?<=;)PD;')
+
+
+def needle_points(commands, start=(0, 0)):
+    """Follows the relative moves in a command string and returns the
+    positions of all needle strikes as list of tuples."""
+    return follow(commands, start)[0]
+
+
+def follow(commands, start=(0, 0)):
+    """Returns needle strike positions of a command string (see
+    needle_points) and the head position after it."""
+    x, y = start
+    points = []
+    for token in TOKEN_RE.finditer(commands):
+        x_rel, y_rel = token.groups()
+        if x_rel is None:
+            points.append((x, y))
+        else:
+            x = round(x + float(x_rel), 2)
+            y = round(y + float(y_rel), 2)
+    return points, (x, y)
+
+
+def speed_change(speed):
+    """Returns the commands setting travel speed in steps/s, with *VB in
+    the proportion INIT sets it."""
+    return SPEED_CHANGE % (speed, speed,
+                           int(round(speed * SPEED[2] / float(SPEED[0]))))
+
+
+class Job(object):
+    """Ordered needle points, encoded into commands only when the sender
+    pulls them.
+
+    Positions are handled in hundredths of a mm, the resolution of the move
+    command, so relative moves add up to the exact target positions. Only
+    they are kept, the moves between them are computed in chunks of
+    strokes, so a job file's memory-mapped records are never copied as a
+    whole.
+
+    Up to max_run adjacent points in a horizontal or vertical line are
+    marked as one stroke: a single command sequence stepping from dot to
+    dot, acknowledged once. Points are adjacent if they are at most pitch
+    mm apart, by default the smallest axis-parallel step of the job.
+
+    With speeds, the travel speed is changed before the move to a stroke
+    whenever it differs from the one before, and set back to base_speed
+    after the last stroke (see motion.SpeedProfile)."""
+
+    def __init__(self, points, start=(0, 0), max_run=1, pitch=None,
+                 runs=None, speeds=None, base_speed=None, positions=None):
+        """Initialization with (N, 2) array of ordered points in mm and the
+        head position the job starts from. positions are the points as
+        (N, 2) integer array in hundredths of a mm instead, e.g. the
+        records of a job file. runs are the stroke start indices of a job
+        compiled before, they don't depend on start. speeds are the travel
+        speeds in steps/s per stroke, base_speed the one in effect before
+        and after the job."""
+        if positions is None:
+            positions = np.rint(planner.as_points(points) * 100).astype(
+                np.int64)
+        self.positions = positions
+        self.start = tuple(start)
+        self.max_run = max_run
+        self.pitch = pitch
+        self.speeds = None if speeds is None else np.asarray(speeds)
+        self.base_speed = base_speed
+        # number of points already pulled by the sender
+        self.sent = 0
+
+        self.__origin = np.rint(np.asarray(start, dtype=float) *
+                                100).astype(np.int64)
+        # index of each stroke's first point
+        self.runs = self.__find_runs(max_run, pitch) if runs is None \
+            else np.asarray(runs)
+
+    @property
+    def points(self):
+        """(N, 2) array of the points in mm."""
+        return self.positions / 100.0
+
+    @property
+    def steps(self):
+        """(N, 2) array of the moves to each point in hundredths of a mm."""
+        return self.moves(0, len(self))
+
+    def moves(self, start, stop):
+        """Returns (M, 2) array of the moves to the points start to stop
+        in hundredths of a mm."""
+        targets = np.asarray(self.positions[start:stop], dtype=np.int64)
+        steps = np.empty_like(targets)
+        if len(targets):
+            steps[0] = targets[0] - (self.positions[start - 1] if start
+                                     else self.__origin)
+            np.subtract(targets[1:], targets[:-1], out=steps[1:])
+        return steps
+
+    def stroke_chunks(self, first=0):
+        """Yields (stroke index, bounds, moves) for chunks of up to
+        STROKE_CHUNK strokes from stroke index first on. bounds are the
+        point indices of the strokes' first points followed by the one
+        after the chunk, moves the moves to its points (see moves)."""
+        n = len(self.runs)
+        for i in range(first, n, STROKE_CHUNK):
+            stop = min(i + STROKE_CHUNK, n)
+            bounds = np.append(self.runs[i:stop],
+                               self.runs[stop] if stop < n else len(self))
+            yield i, bounds, self.moves(int(bounds[0]), int(bounds[-1]))
+
+    def __find_runs(self, max_run, pitch):
+        """Returns start indices of the strokes."""
+        n = len(self)
+        if max_run <= 1 or n < 2:
+            return np.arange(n)
+
+        steps = self.steps
+        # axis-parallel, non-zero steps
+        axial = (steps[:, 0] == 0) != (steps[:, 1] == 0)
+        length = np.abs(steps).max(axis=1)
+        if pitch is None:
+            if not axial[1:].any():
+                return np.arange(n)
+            limit = length[1:][axial[1:]].min()
+        else:
+            limit = int(round(pitch * 100))
+        adjacent = (axial & (length <= limit)).tolist()
+
+        steps = steps.tolist()
+        runs = [0]
+        run_length = 1
+        for i in range(1, n):
+            # the first step of a stroke sets its direction
+            if adjacent[i] and run_length < max_run and \
+                    (run_length == 1 or steps[i] == steps[i - 1]):
+                run_length += 1
+            else:
+                runs.append(i)
+                run_length = 1
+        return np.array(runs)
+
+    def remaining(self, first, start=(0, 0)):
+        """Returns Job of the strokes from point index first on, starting at
+        start. first must be the first point of a stroke."""
+        strokes = int(np.searchsorted(self.runs, first))
+        if strokes < len(self.runs) and self.runs[strokes] != first:
+            raise ValueError('Point %d is inside a stroke.' % first)
+        return Job(None, start, self.max_run, self.pitch,
+                   self.runs[strokes:] - first,
+                   None if self.speeds is None else self.speeds[strokes:],
+                   self.base_speed, self.positions[first:])
+
+    def __len__(self):
+        """Number of needle points."""
+        return len(self.positions)
+
+    @property
+    def acks(self):
+        """Number of answers for the whole job, a move and a needle answer
+        per stroke."""
+        return 2 * len(self.runs)
+
+    @property
+    def end(self):
+        """Head position in mm after the job."""
+        if not len(self):
+            return self.start
+        x, y = self.positions[-1] / 100.0
+        return float(x), float(y)
+
+    def in_bounds(self, max_x, max_y):
+        """True if all points are within (0, 0) and (max_x, max_y)."""
+        if not len(self):
+            return True
+        limits = np.rint(np.array((max_x, max_y)) * 100)
+        return bool((self.positions.min(axis=0) >= 0).all() and
+                    (self.positions.max(axis=0) <= limits).all())
+
+    def __first_run(self, first):
+        """Returns index of the stroke containing point index first."""
+        return max(int(np.searchsorted(self.runs, first, 'right')) - 1, 0)
+
+    def commands(self, first=0):
+        """Yields the commands of every stroke, starting at the stroke which
+        contains point index first."""
+        for _, commands in self.__encode(first):
+            yield commands
+
+    def __encode(self, first):
+        """Yields the index of the point after each stroke and the stroke's
+        commands, see commands."""
+        if first >= len(self):
+            return
+        last = len(self.runs) - 1
+        # set at the first stroke sent, wherever the sender starts
+        speed = None
+        for chunk, bounds, moves in self.stroke_chunks(
+                self.__first_run(first)):
+            offset = int(bounds[0])
+            bounds = bounds.tolist()
+            steps = moves.tolist()
+            speeds = None if self.speeds is None else \
+                self.speeds[chunk:chunk + len(bounds) - 1].tolist()
+            for i in range(len(bounds) - 1):
+                start, stop = bounds[i] - offset, bounds[i + 1] - offset
+                change = ''
+                if speeds is not None and speeds[i] != speed:
+                    speed = speeds[i]
+                    change = speed_change(speed)
+                move = MOVE % tuple(d / 100.0 for d in steps[start])
+                commands = change + move + STROKE % ''.join(
+                    STROKE_STEP % (x / 100.0, y / 100.0)
+                    for x, y in steps[start + 1:stop])
+                if speed is not None and chunk + i == last and \
+                        speed != self.base_speed:
+                    # goes out with the next commands, which move at
+                    # base_speed
+                    commands += speed_change(self.base_speed)
+                yield bounds[i + 1], commands
+
+    def __iter__(self):
+        """Yields commands for all strokes not sent yet."""
+        for stop, cmd in self.__encode(self.sent):
+            # count before yielding, the sender queues it right away
+            self.sent = stop
+            yield cmd
+
+    def pending_points(self):
+        """Returns (N, 2) array of points not sent yet, in mm as sent."""
+        return self.positions[self.sent:] / 100.0
+
+    def pending(self):
+        """Returns commands for all points not sent yet as one string."""
+        return ''.join(self.commands(self.sent))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import collections
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import numpy as np
+from job import Job
+
+
+def image_key(image_file, *params):
+    """Returns cache key for the content of an image file and the
+    parameters it is compiled with."""
+    digest = hashlib.sha1()
+    with open(image_file, 'rb') as img_file:
+        for chunk in iter(lambda: img_file.read(65536), b''):
+            digest.update(chunk)
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def picture_key(image_file, bounding_box, granularity, slow_motion, order,
+                dither, threshold, max_run):
+    """Returns cache key of an image compiled with the parameters of
+    Marker.compile_picture."""
+    return image_key(image_file, tuple(bounding_box), granularity,
+                     slow_motion, order, dither, threshold, max_run)
+
+
+class JobCache(object):
+    """LRU cache of compiled jobs: the ordered needle points and the start
+    index of every stroke.
+
+    The last capacity entries are kept in memory. With a directory, every
+    entry is also written there as .npy files, which are memory-mapped when
+    loaded again; the least recently used files beyond disk_capacity are
+    removed."""
+
+    def __init__(self, directory=None, capacity=16, disk_capacity=256):
+        """Initialization with cache directory (None for memory only)."""
+        self.directory = directory
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.hits = 0
+        self.misses = 0
+        # key<(points, runs)> from least to most recently used
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __paths(self, key):
+        """Returns the file paths of points and runs for key."""
+        return (os.path.join(self.directory, '%s.points.npy' % key),
+                os.path.join(self.directory, '%s.runs.npy' % key))
+
+    def get(self, key):
+        """Returns (points, runs) arrays for key or None."""
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is None and self.directory is not None:
+                entry = self.__load(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__remember(key, entry)
+            return entry
+
+    def job(self, key, max_run=1, start=(0, 0)):
+        """Returns the cached Job for key, starting at position start, or
+        None."""
+        cached = self.get(key)
+        if cached is None:
+            return None
+        points, runs = cached
+        logging.info('%d needle points from job cache.' % len(points))
+        return Job(points, start, max_run, runs=runs)
+
+    def put(self, key, points, runs):
+        """Stores ordered (N, 2) points in mm and stroke start indices."""
+        entry = (np.asarray(points, dtype=float), np.asarray(runs))
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__remember(key, entry)
+            if self.directory is not None:
+                self.__store(key, entry)
+
+    def __remember(self, key, entry):
+        """Adds entry as most recently used and evicts the oldest ones."""
+        self.__entries[key] = entry
+        while len(self.__entries) > self.capacity:
+            self.__entries.popitem(last=False)
+
+    def __load(self, key):
+        """Maps an entry from disk, returns None if not cached."""
+        try:
+            entry = tuple(np.load(path, mmap_mode='r')
+                          for path in self.__paths(key))
+        except (IOError, ValueError):
+            return None
+        for path in self.__paths(key):
+            # the modification time orders the files for eviction
+            os.utime(path)
+        return entry
+
+    def __store(self, key, entry):
+        """Writes an entry to disk and evicts the oldest files."""
+        for path, array in zip(self.__paths(key), entry):
+            # write a temporary file first, readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.npy')
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.save(tmp_file, array)
+            os.replace(tmp, path)
+
+        stored = [os.path.join(self.directory, name)
+                  for name in os.listdir(self.directory)
+                  if name.endswith('.points.npy')]
+        stored.sort(key=os.path.getmtime)
+        for points_path in stored[:max(len(stored) - self.disk_capacity, 0)]:
+            key = os.path.basename(points_path)[:-len('.points.npy')]
+            for path in self.__paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
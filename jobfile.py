@@ -0,0 +1,95 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import struct
+import sys
+import zlib
+import numpy as np
+from job import Job
+from protocol import SPEED, SLOW_SPEED
+
+MAGIC = b'BMJ1'
+# magic, MAX_X and MAX_Y in hundredths of a mm, INIT speed parameters
+# (*VN x, *VN y, *VB), max_run, number of records, CRC-32 of the records
+HEADER = struct.Struct('<4s2i3iIII')
+# needle point in hundredths of a mm, flag for the first point of a stroke
+RECORD = np.dtype([('x', '<i4'), ('y', '<i4'), ('first', 'u1')])
+# records checked at a time
+CRC_CHUNK = 1 << 16
+
+
+def write(path, job, max_x, max_y, slow_motion=False):
+    """Writes a Job for a machine with the given limits and speed."""
+    records = np.zeros(len(job), dtype=RECORD)
+    records['x'], records['y'] = job.positions[:, 0], job.positions[:, 1]
+    records['first'][job.runs] = 1
+    data = records.tobytes()
+    header = HEADER.pack(MAGIC, int(round(max_x * 100)),
+                         int(round(max_y * 100)),
+                         *((SLOW_SPEED if slow_motion else SPEED) + (
+                             job.max_run, len(records), zlib.crc32(data))))
+    with open(path, 'wb') as job_file:
+        job_file.write(header)
+        job_file.write(data)
+
+
+class JobFile(object):
+    """Job file, the records are memory-mapped. Opening and verifying
+    reads them in chunks, the Job of job() encodes them in chunks while
+    it is sent."""
+
+    def __init__(self, path, verify=True):
+        """Opens a job file and checks the records against the checksum."""
+        with open(path, 'rb') as job_file:
+            header = job_file.read(HEADER.size)
+        if len(header) < HEADER.size or header[:4] != MAGIC:
+            raise Exception('%s is no job file.' % path)
+        _, max_x, max_y, vn_x, vn_y, vb, self.max_run, count, crc = \
+            HEADER.unpack(header)
+        self.max_x = max_x / 100.0
+        self.max_y = max_y / 100.0
+        self.speeds = (vn_x, vn_y, vb)
+        self.records = np.memmap(path, dtype=RECORD, mode='r',
+                                 offset=HEADER.size, shape=(count,)) \
+            if count else np.zeros(0, dtype=RECORD)
+        if verify and self.crc32() != crc:
+            raise Exception('%s is corrupt.' % path)
+
+    def crc32(self):
+        """Returns the CRC-32 of the records."""
+        crc = 0
+        for start in range(0, len(self.records), CRC_CHUNK):
+            crc = zlib.crc32(self.records[start:start + CRC_CHUNK].tobytes(),
+                             crc)
+        return crc
+
+    @property
+    def slow_motion(self):
+        """True if the job was compiled for slow motion."""
+        return self.speeds == SLOW_SPEED
+
+    def __len__(self):
+        """Number of needle points."""
+        return len(self.records)
+
+    def job(self, start=(0, 0)):
+        """Returns the Job starting at position start, reading its points
+        from the records."""
+        # x and y of every record, without copying them
+        positions = np.ndarray((len(self.records), 2), '<i4', self.records,
+                               strides=(RECORD.itemsize, 4))
+        return Job(None, start, self.max_run,
+                   runs=np.flatnonzero(self.records['first']),
+                   positions=positions)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (5, 6):
+        sys.exit('usage: %s <image> <x0,y0,x1,y1> <granularity> <job file> '
+                 '[max_run]' % sys.argv[0])
+    from marker import BaseMarker, compile_picture
+    image, box, granularity, path = sys.argv[1:5]
+    max_run = int(sys.argv[5]) if len(sys.argv) == 6 else 1
+    job = compile_picture(image, tuple(float(v) for v in box.split(',')),
+                          float(granularity), max_run=max_run)
+    write(path, job, BaseMarker.MAX_X, BaseMarker.MAX_Y)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def as_boxes(bounding_boxes):
+    """Returns (N, 4) float array of boxes as (x0, y0, x1, y1) with x0 <= x1
+    and y0 <= y1."""
+    boxes = np.asarray(bounding_boxes, dtype=float).reshape(-1, 4)
+    return np.column_stack((np.minimum(boxes[:, :2], boxes[:, 2:]),
+                            np.maximum(boxes[:, :2], boxes[:, 2:])))
+
+
+def overlaps(bounding_boxes):
+    """Returns list of index pairs (i, j), i < j, of overlapping bounding
+    boxes. Boxes sharing an edge don't overlap."""
+    boxes = as_boxes(bounding_boxes)
+    low, high = boxes[:, np.newaxis, :2], boxes[:, 2:]
+    overlap = ((low < high) & (boxes[:, 2:][:, np.newaxis] > boxes[:, :2])
+               ).all(axis=2)
+    i, j = np.nonzero(np.triu(overlap, 1))
+    return list(zip(i.tolist(), j.tolist()))
+
+
+def check(bounding_boxes, max_x, max_y):
+    """Raises an Exception if bounding boxes overlap or leave the plate of
+    max_x x max_y mm."""
+    boxes = as_boxes(bounding_boxes)
+    outside = np.flatnonzero((boxes[:, :2] < 0).any(axis=1) |
+                             (boxes[:, 2] > max_x) | (boxes[:, 3] > max_y))
+    if len(outside):
+        raise Exception('Bounding box %d %s is not on the plate.' % (
+            outside[0], tuple(boxes[outside[0]].tolist())))
+    for i, j in overlaps(boxes):
+        raise Exception('Bounding boxes %d %s and %d %s overlap.' % (
+            i, tuple(boxes[i].tolist()), j, tuple(boxes[j].tolist())))
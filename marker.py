@@ -2,39 +2,85 @@
 # -*- coding: utf-8 -*-
 
 import threading
+import collections
+import concurrent.futures
 import logging
+import math
 import time
+import answers
 import serial
-import re
+import ioloop
 import warnings
-from datetime import datetime, timedelta
+import planner
+import raster
+import cmdqueue
+import jobcache
+import estimator
+import jobfile
+import checkpoint
+import layout
+import metrics
+import preview
+import vector
+import numpy as np
+from job import Job, follow
+from protocol import INIT, HOME, MOVE, EMERGENCY_OFF, NEEDLE, SPEED, \
+    SLOW_SPEED
+from datetime import timedelta
 try:
     import Image
-    import ImageDraw
 except ImportError:
     from PIL import Image
-    from PIL import ImageDraw
-
-
-INIT = '*SQ;;*SQ;;*SQ;*CB;*INITstn;*INITzn;*DB;*CPa;*SE;*CPz;*CPd;' \
-        '*CPa;*SE;*INITp301;*OI;;*CPa;*RTEOF;*SE;*INITwn;*INITgn;*INITppn,' \
-        'pj;*INITzpj;*INITzn;*INITd16,0,5,500,20000;*INITdx15,0,30;*WD10;' \
-        '*WU10;*SE;*INITs100.00,100.00;*INITo-100,-100;;*INITno0,0;*INITrd+,' \
-        '+;*INITrr+,+;*INITrs+,+;LO1;*LBn;*INITesn,n;*INITze-,-;*VM6500,' \
-        '6500;*VN%d,%d;*VS400,400;*SE;*VB%d;*VH600,600;*VP600,600;*VC600,' \
-        '600;*SE;;*AC90000,90000;*LBd0.00;*LBm1.4,1.16;;*INITn1;;*INITxqrap;' \
-        ';*INITxp5;*INITzs0;;*INITaen,asn,adj;*MO18E1,9600;*CPa;*SE;;' \
-        '*INITbeL,0,beL,1,beL,2,beH,3,beL,4,beH,5,beH,6,beL,7,beL,8,beL,9,' \
-        'beL,10,beL,11,beL,12,beL,13,beL,14,beL,15,beL,16,beL,17,beL,18,beL,' \
-        '19,beL,20,beL,21,beL,22,beL,23,beL,24;*INITbaD,22,baD,21,baD,20,' \
-        'baD,19,baD,18,baD,17,baD,16,baD,15,baD,14,baD,13,baD,12,baD,11,baD,' \
-        '10,baD,9,baD,8,baD,7,baD,6,baD,5,baD,4,baD,3,baD,2,baD,1,ba0,0;*SE;' \
-        ';;;*VP1200,1200;;*CPa;*RTEOF;*SE;CS6;*INITbe0,5;;*CPa;*RTEOF;' \
-        '*SE;;*XRH;;*EB;*SE;;*SH;;*SH;;*SH;;*SH;;PU;;*INITrr+,+;'
-HOME = ';*INITrd+,+;*RX;*RY;*RTHOME;*SH;;*SE;;*OA;;*SH;;*SE;'
-MOVE = ';*PR%02.2f,%02.2f;;*SH;*OA;*SE;'
-EMERGENCY_OFF = ';;*HE;;;'
-NEEDLE = 'SP1;;PD;*WT250;PU;*SE;'
+
+# orders taking long enough to order pictures tile by tile while marking
+TILED_ORDERS = ('nearest', '2opt')
+
+
+def load_picture(image_file, bounding_box, granularity=5, dither=True,
+                 threshold=128, confirm=None):
+    """Returns the (N, 2) array of needle points in mm for an image in the
+    given bounding box. confirm(question) is asked if the image resolution
+    is too low."""
+    # open image to file and convert to black and white
+    width, height = raster.raster_size(bounding_box, granularity)
+
+    logging.debug("start marking pic")
+
+    with open(image_file, 'rb') as img_file:
+        with Image.open(img_file) as img:
+            # resolution too low
+            if confirm is not None and \
+                    (img.size[0] < width or img.size[1] < height):
+
+                confirm('Image resolution might be too low for given '
+                        'bounding box and granularity. Mark anyway?')
+
+            return raster.rasterize(img, bounding_box, granularity, dither,
+                                    threshold)
+
+
+def plan(points, order='2opt', max_run=1, start=(0, 0), executor=None):
+    """Orders needle points starting at start and returns them as Job. With
+    an executor, tiles are ordered in parallel (see planner.order_tiled)."""
+    if executor is not None:
+        ordered = planner.order_tiled(points, order, start, executor=executor)
+    else:
+        ordered = planner.order_points(points, order, start)
+    raster_travel = planner.travel_length(points, start)
+    travel = planner.travel_length(ordered, start)
+    logging.info('%d needle points; travel %.2f mm in raster order, '
+                 '%.2f mm in %s order.' % (len(ordered), raster_travel,
+                                           travel, order))
+    return Job(ordered, start, max_run)
+
+
+def compile_picture(image_file, bounding_box, granularity=5, order='2opt',
+                    dither=True, threshold=128, max_run=1):
+    """Returns the Job marking an image (see Marker.mark_picture) ordered
+    from the home position, like the jobs in a job cache. Runs in worker
+    processes (see dispatcher.Dispatcher)."""
+    return plan(load_picture(image_file, bounding_box, granularity, dither,
+                             threshold), order, max_run)
 
 
 class SerialAnswer(object):
@@ -74,78 +120,248 @@ class SerialAnswer(object):
         return '%d/%d' % (self.done, self.tbd)
 
 
-class Marker(threading.Thread):
-    """Borries marker representation."""
+class BaseMarker(object):
+    """Position tracking, bounds checks and command generation shared by
+    Marker and AsyncMarker.
+
+    Methods call each other through BaseMarker explicitly, AsyncMarker
+    overrides the public ones with coroutines."""
     MAX_X = 122.5
     MAX_Y = 102.5
 
-    __x = 0
-    __y = 0
-
-    # command buffers
-    read_buf = r''
-    write_buf = r''
+    # smaller jobs are ordered in one piece even with workers
+    parallel_min_points = 20000
 
-    daemon = True
-    running = True
-    start_time = None
+    # points per tile of pictures ordered while marking, see mark_picture
+    stream_tile_points = 2000
 
-    def __init__(self, device, slow_motion=False, log_level=logging.DEBUG):
+    __x = 0
+    __y = 0
 
-        """Initializes marker and moves to home position."""
-        threading.Thread.__init__(self)
-        self.lock = threading.RLock()
-        logging.basicConfig(level=log_level,
-                            format='%(asctime)s %(levelname)-8s %(message)s',
-                            datefmt='%H:%M:%S')
-        self.__serial = serial.Serial(device, timeout=0)
+    # seconds between ETA log lines
+    eta_interval = 1.0
+
+    # Prometheus text file the metrics are written to every
+    # metrics_interval seconds while running, None to disable
+    metrics_file = None
+    metrics_interval = 5.0
+
+    # file the progress of the running job is saved to every
+    # checkpoint_interval seconds and when marking stops, see resume
+    checkpoint_file = None
+    checkpoint_interval = 1.0
+
+    # motion.SpeedProfile choosing the travel speed of every stroke of a
+    # job, None to move at the speed INIT set
+    speed_profile = None
+
+    def __init__(self, high_water=1024, window=4, job_cache=None,
+                 workers=None, batch_bytes=None):
+        """Initializes command queue and answer counters. Pictures are
+        compiled only once if a jobcache.JobCache is given. With workers,
+        large jobs are ordered in tiles by a pool of worker processes. With
+        batch_bytes, queued datagrams are sent in writes of up to that many
+        bytes as far as the window allows."""
+        self.metrics = metrics.Metrics()
+        # producers and the sender wait for the queue's lock (see metrics)
+        self.queue = cmdqueue.CommandQueue(
+            high_water, self.metrics.timed_lock(threading.RLock()))
+        self.window = window
+        self.batch_bytes = batch_bytes
+        self.job_cache = job_cache
+        self.workers = workers
+        self.slow_motion = False
+        self.estimator = estimator.Estimator()
+        self.parser = answers.AnswerParser({b'ST': self._on_movement})
+        self.parser.register(b'RS', self._on_status, prefix=True)
+        # last heartbeat answer and when it was received
+        self.status = None
+        self.status_time = 0
+        self.__last_eta = 0
+        self.__last_export = 0
+        self.__last_checkpoint = 0
+        # [job, ST count before it, job_key, offset of its first point] of
+        # queued jobs, the last one is kept when it is done
+        self.__jobs = collections.deque()
+        # job_key and offset of the job resume is queueing
+        self.__resuming = (None, 0)
+        # commands sent so far, counted like SerialAnswer.tbd
+        self.sent_acks = 0
         # count<prefix of answer, SerialAnswer object>
         self.count = {
             'ST': SerialAnswer(.5),  # movement
         }
-
-        # slow motion mode
+        self.metrics.gauge('queue_depth', lambda: len(self.queue))
+        self.metrics.gauge('in_flight', self.in_flight)
+        for prefix, count in self.count.items():
+            self.metrics.gauge('%s_done' % prefix.lower(),
+                               lambda count=count: count.done)
+            self.metrics.gauge('%s_tbd' % prefix.lower(),
+                               lambda count=count: count.tbd)
+
+    def initialize(self, slow_motion=False):
+        """Sends init sequence and moves to home position."""
+        self.slow_motion = slow_motion
+        # slow motion mode; init sends 12 answers when done
         if slow_motion:
-            self.write_buf += INIT % (650, 650, 220)
+            self._send(INIT % SLOW_SPEED, 12)
+        else:
+            self._send(INIT % SPEED, 12)
+        return BaseMarker.home(self)
+
+    def restore(self, position, slow_motion=False):
+        """Takes over the position and speed of a controller which is still
+        set up from an earlier session instead of initializing it."""
+        self.slow_motion = slow_motion
+        self.estimator.model.update(INIT % (SLOW_SPEED if slow_motion
+                                            else SPEED))
+        self.__x, self.__y = position
+
+    def _send(self, commands, acks):
+        """Queues commands which are acknowledged with acks answers."""
+        self.queue.put(commands, acks)
+        self.count['ST'].tbd += acks
+        self.estimator.add_commands(commands, acks, self.position())
+
+    def _send_job(self, job):
+        """Queues the job's commands, which are encoded when the sender
+        pulls them."""
+        self.queue.put_stream(job, 2)
+        key, offset = self.__resuming
+        self.__jobs.append([job, self.count['ST'].tbd, key, offset])
+        self.__resuming = (None, 0)
+        # every stroke sends a move and a needle answer
+        self.count['ST'].tbd += job.acks
+        self.estimator.add_job(job)
+
+    def _next_datagram(self):
+        """Returns the next Datagram to send or None (see batch_bytes),
+        timing the encoding of queued jobs."""
+        start = time.perf_counter()
+        if self.batch_bytes:
+            datagram = self.queue.get(self.batch_bytes,
+                                      self.window - self.in_flight())
         else:
-            self.write_buf += INIT % (6500, 6500, 2200)
+            datagram = self.queue.get()
+        histograms = self.metrics.histograms
+        histograms['get_seconds'].observe(time.perf_counter() - start)
+        histograms['queue_depth'].observe(len(self.queue))
+        return datagram
+
+    def _written(self, datagram):
+        """Accounts for a Datagram written to the port."""
+        self.sent_acks += datagram.acks
+        self.metrics.sent(len(datagram),
+                          self.sent_acks if datagram.acks else None)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('write: %s' % datagram.decode())
+
+    def _export_metrics(self, force=False):
+        """Writes metrics_file if metrics_interval passed since the last
+        time."""
+        if self.metrics_file is None:
+            return
+        now = time.time()
+        if not force and now - self.__last_export < self.metrics_interval:
+            return
+        self.__last_export = now
+        try:
+            self.metrics.write_prometheus(self.metrics_file)
+        except OSError as e:
+            logging.warning('Writing metrics failed: %s' % e)
+
+    def progress(self):
+        """Returns job_key, index of the first unacknowledged point and
+        number of points of the first unfinished or last queued job, None
+        without jobs (see checkpoint)."""
+        done = self.count['ST'].done
+        jobs = self.__jobs
+        while len(jobs) > 1 and done >= jobs[0][1] + jobs[0][0].acks:
+            jobs.popleft()
+        if not jobs:
+            return None
+        entry = jobs[0]
+        job, first_ack, key, offset = entry
+        if key is None:
+            key = entry[2] = checkpoint.job_key(job)
+        return (key, offset + checkpoint.progress(job, done - first_ack),
+                offset + len(job))
+
+    def _save_checkpoint(self, force=False):
+        """Writes checkpoint_file if checkpoint_interval passed since the
+        last time."""
+        if self.checkpoint_file is None:
+            return
+        now = time.time()
+        if not force and now - self.__last_checkpoint < \
+                self.checkpoint_interval:
+            return
+        self.__last_checkpoint = now
+        state = self.progress()
+        if state is None:
+            return
+        try:
+            checkpoint.save(self.checkpoint_file, *state)
+        except OSError as e:
+            logging.warning('Writing checkpoint failed: %s' % e)
+
+    def feed(self, data):
+        """Handles received bytes (see answers.AnswerParser)."""
+        self.metrics.received(len(data))
+        self.parser.feed(data)
+
+    def _on_movement(self, answer):
+        """Counts a movement answer, logs the ETA every eta_interval
+        seconds and when all commands are done."""
+        count = self.count['ST']
+        count.increment_done()
+        self.estimator.observe(count.done)
+        self.metrics.answered('ST', count.done)
+
+        now = time.time()
+        if now - self.__last_eta < self.eta_interval and \
+                count.done < count.tbd:
+            return
+        self.__last_eta = now
+        eta = timedelta(seconds=self.estimator.remaining(count.done))
+
+        days, seconds = eta.days, eta.seconds
+        hrs = days * 24 + seconds // 3600
+        min = (seconds % 3600) // 60
+        sec = seconds % 60
+
+        logging.info('%s ST executed; %.2f%%; ETA: %02d:%02d:%02d.' % (
+            count, count.perc_done, hrs, min, sec))
+
+    def _on_status(self, answer):
+        """Keeps the heartbeat answer, e.g. RSIX800O00."""
+        self.status = answer.tobytes()
+        self.status_time = time.time()
+        self.metrics.answered('RS', self.metrics.answers['RS'] + 1)
+
+    def in_flight(self):
+        """Number of sent commands which are not acknowledged yet."""
+        return self.sent_acks - self.count['ST'].done
+
+    def in_bounds(self, x, y):
+        """True if absolute position (x, y) is within the machine limits."""
+        return 0 <= x <= self.MAX_X and 0 <= y <= self.MAX_Y
 
-        # init sends 12 answers when done
-        self.count['ST'].tbd += 12
-        self.home()
+    def emergency_off(self, cause='client'):
+        """Drops all queued commands, sends emergency off sequence and
+        raises an Exception."""
+        logging.error("EMERGENCY OFF")
+        # make sure queued commands won't get sent anymore
+        self.queue.close()
+        self._save_checkpoint(force=True)
+        err = Exception('Emergency off triggered by %s' % cause)
+        self._emergency_off(err)
+        logging.error(err)
+        raise err
 
-    def read(self, size=102400):
-        """Reads given amount of bytes in buffer and logs them."""
-        self.read_buf += str(self.__serial.read(size), encoding='UTF-8')
-        while '\r' in self.read_buf:
-            answer, self.read_buf = self.read_buf.split('\r', 1)
-            logging.debug('read: %s' % answer)
-
-            # safe answer count per type
-            prefix = answer.split()[0]
-            if prefix in self.count:
-                count = self.count[prefix]
-                self.count[prefix].increment_done()
-
-                if count.done > 0 and not self.start_time:
-                    self.start_time = datetime.now()
-
-                # start estimation when enough data is available
-                if self.start_time and count.done > 2:
-                    runtime = (datetime.now() - self.start_time).seconds
-                    eta_seconds = (runtime * (1 - (count.perc_done/100.0))) / \
-                        (count.perc_done/100.0)
-                    eta = timedelta(seconds=eta_seconds)
-
-                    days, seconds = eta.days, eta.seconds
-                    hrs = days * 24 + seconds // 3600
-                    min = (seconds % 3600) // 60
-                    sec = seconds % 60
-
-                    logging.info('%s %s executed; %.2f%%; ETA: '
-                                 '%02d:%02d:%02d.' % (count, prefix,
-                                                      count.perc_done,
-                                                      hrs, min, sec))
+    def _emergency_off(self, err):
+        """Sends emergency off sequence past the queue, err is the Exception
+        emergency_off raises. BaseMarker has no controller to send to."""
 
     def position(self):
         """Returns x and y position as tuple."""
@@ -155,37 +371,25 @@ class Marker(threading.Thread):
         """Moves to home position and resets position counter."""
         # improve speed to home position: move to (1,1)
         if self.position() != (0, 0):
-            self.move_abs(1, 1)
+            BaseMarker.move_abs(self, 1, 1)
 
-        self.write_buf += HOME
         # home sends 2 move answers when done
-        self.count['ST'].tbd += 2
+        sent = self._send(HOME, 2)
 
         self.__x = 0
         self.__y = 0
-
-    def emergency_off(self, cause='client'):
-        """Sends emergency off sequence."""
-        # make sure write buffer won't get send anymore
-        logging.error("EMERGENCY OFF")
-        self.running = False
-        # do not use write buffer, send directly
-        self.__serial.write(EMERGENCY_OFF.encode())
-        self.__serial.flush()
-        err = 'Emergency off triggered by %s' % cause
-        logging.error(err)
-        raise Exception(err)
+        return sent
 
     def move_rel(self, x, y):
         """Moves to given relative position."""
-        if 0 <= x + self.__x <= self.MAX_X and 0 <= y + self.__y <= self.MAX_Y:
+        if self.in_bounds(x + self.__x, y + self.__y):
             x = round(x, 2)
             y = round(y, 2)
-            self.write_buf += r';*PR%02.2f,%02.2f;;*SH;*OA;*SE;' % (x, y)
+            sent = self._send(MOVE % (x, y), 1)
 
             self.__x = self.__x + x
             self.__y = self.__y + y
-            self.count['ST'].tbd += 1
+            return sent
 
         else:
             self.emergency_off('(%02.2f,%02.2f) out of bounds.'
@@ -195,84 +399,244 @@ class Marker(threading.Thread):
         """Moves to given absolute position."""
         rel_x = x - self.__x
         rel_y = y - self.__y
-        self.move_rel(rel_x, rel_y)
+        return BaseMarker.move_rel(self, rel_x, rel_y)
 
     def needle_down(self):
         """Moves the needle marking unit down."""
-        self.write_buf += NEEDLE
-        self.count['ST'].tbd += 1
-
-    def mark_picture(self, image_file, bounding_box, granularity=5):
-        """Takes an image and marks it in the given bounding box."""
-        # open image to file and convert to black and white
-        start_x, start_y, end_x, end_y = bounding_box
-        width = end_x - start_x
-        height = end_y - start_y
-
-        logging.debug("start marking pic")
-
-        with open(image_file, 'rb') as img_file:
-            with Image.open(img_file) as img:
-                # resolution too low
-                if img.size[0] < width*granularity or \
-                        img.size[1] < height*granularity:
-
-                    self.user_confirmation('Image resolution might be too low '
-                                           'for given bounding box and '
-                                           'granularity. Mark anyway?')
-
-                img = img.resize((width*granularity, height*granularity),
-                                 Image.ANTIALIAS)
-                granularity = float(granularity)
-                img_bw = img.convert('1')
-
-                # do the actual pixel marking
-                for x in range(0, img_bw.size[0]):
-                    for y in range(0, img_bw.size[1]):
-                        pixel_value = img_bw.getpixel((x, y))
-                        if pixel_value == 0:
-                            self.move_abs(start_x+(x*(1/granularity)),
-                                          start_y+(y*(1/granularity)))
-                            self.needle_down()
-                            logging.debug("marking %d/%d" % (start_x+(x*(1/granularity)), start_y+(y*(1/granularity))))
-                            time.sleep(.01)
-
-    def preview(self, rds=10, preview_file='preview.png'):
-        """Preview marking points in png before marking starts."""
-        white = (255, 255, 255)
-        black = (0, 0, 0)
+        return self._send(NEEDLE, 1)
+
+    def mark_picture(self, image_file, bounding_box, granularity=5,
+                     order='2opt', dither=True, threshold=128, max_run=1):
+        """Takes an image and marks it in the given bounding box. Gray areas
+        are dithered or cut at threshold (see raster.black_pixels), the
+        needle points are visited in the given order (see mark_points).
+
+        Ordering a whole plate of 160k dots at 5/mm in one piece takes about
+        7 s with '2opt' ('nearest' 2 s). Without a job cache, these orders
+        are applied to tiles of about stream_tile_points points instead
+        (see tiled_paths), each queued as a Job of its own as soon as it is
+        ordered. Marking a whole plate then starts after about 0.1 s, the
+        head travels about 2 % farther. Compile the picture (see
+        compile_picture) to resume it after an interruption."""
+        if self.job_cache is not None or order not in TILED_ORDERS:
+            return self.mark_job(BaseMarker.compile_picture(
+                self, image_file, bounding_box, granularity, order, dither,
+                threshold, max_run))
+        points = self.load_picture(image_file, bounding_box, granularity,
+                                   dither, threshold)
+        sent = None
+        for path in BaseMarker.tiled_paths(self, points, order):
+            sent = self.mark_job(Job(path, self.position(), max_run))
+        return sent
+
+    def tiled_paths(self, points, order='2opt'):
+        """Checks needle points against the machine limits and returns an
+        iterator of their ordered paths in tiles of about
+        stream_tile_points points, from the current position on (see
+        planner.iter_tiled)."""
+        points = planner.as_points(points)
+        if not Job(points).in_bounds(self.MAX_X, self.MAX_Y):
+            self.emergency_off('needle points out of bounds.')
+        tiles = math.sqrt(len(points) / float(self.stream_tile_points))
+        return planner.iter_tiled(points, order, self.position(),
+                                  max(int(math.ceil(tiles)), 1))
+
+    def compile_picture(self, image_file, bounding_box, granularity=5,
+                        order='2opt', dither=True, threshold=128, max_run=1):
+        """Returns the Job marking an image (see mark_picture), from the job
+        cache if the same image was compiled with the same parameters.
+        Cached jobs are ordered from the home position, so they don't
+        depend on where the head is."""
+        if self.job_cache is None:
+            points = self.load_picture(image_file, bounding_box, granularity,
+                                       dither, threshold)
+            return self.plan(points, order, max_run)
+
+        key = jobcache.picture_key(image_file, bounding_box, granularity,
+                                   self.slow_motion, order, dither,
+                                   threshold, max_run)
+        job = self.job_cache.job(key, max_run, self.position())
+        if job is None:
+            points = self.load_picture(image_file, bounding_box, granularity,
+                                       dither, threshold)
+            job = BaseMarker.plan(self, points, order, max_run, (0, 0))
+            self.job_cache.put(key, job.points, job.runs)
+            job = Job(job.points, self.position(), max_run, runs=job.runs)
+        return job
+
+    def mark_batch(self, items, granularity=5, order='2opt', dither=True,
+                   threshold=128, max_run=1):
+        """Marks several images, given as (image_file, bounding_box) items,
+        as one job (see compile_batch)."""
+        return self.mark_job(BaseMarker.compile_batch(
+            self, items, granularity, order, dither, threshold, max_run))
+
+    def compile_batch(self, items, granularity=5, order='2opt', dither=True,
+                      threshold=128, max_run=1):
+        """Returns the Job marking (image_file, bounding_box) items on one
+        plate. The bounding boxes must not overlap. The needle points of
+        all images are ordered together, so the head does not travel back
+        and forth between the images."""
+        items = list(items)
+        boxes = layout.as_boxes([bounding_box for _, bounding_box in items])
+        layout.check(boxes, self.MAX_X, self.MAX_Y)
+        points = [self.load_picture(image_file, tuple(bounding_box.tolist()),
+                                    granularity, dither, threshold)
+                  for (image_file, _), bounding_box in zip(items, boxes)]
+        logging.info('%d images on one plate: %s needle points.' % (
+            len(items), ' + '.join(str(len(p)) for p in points)))
+        return self.plan(np.concatenate(points) if points else
+                         np.empty((0, 2)), order, max_run)
+
+    def load_picture(self, image_file, bounding_box, granularity=5,
+                     dither=True, threshold=128):
+        """Returns the (N, 2) array of needle points in mm for an image in
+        the given bounding box."""
+        return load_picture(image_file, bounding_box, granularity, dither,
+                            threshold, self.user_confirmation)
+
+    def mark_points(self, points, order='2opt', max_run=1):
+        """Marks the (N, 2) array of needle points in mm. The points are
+        visited in the given order (see planner.ORDERS), up to max_run
+        adjacent dots in a line are marked with one stroke (see Job). The
+        points are ordered before anything is queued, see mark_picture for
+        the delay."""
+        return self.mark_job(self.plan(points, order, max_run))
+
+    def mark_polylines(self, polylines, pitch=.2, max_run=1, reorder=True):
+        """Marks polylines, given as (N, 2) arrays in mm, with dots at most
+        pitch mm apart along each line, line by line. With reorder, the
+        lines are visited in nearest neighbour order and may be reversed
+        (see vector.stroke_points)."""
+        points = vector.stroke_points(polylines, pitch,
+                                      self.position() if reorder else None)
+        travel = planner.travel_length(points, self.position())
+        logging.info('%d needle points on %d lines; travel %.2f mm.' % (
+            len(points), len(polylines), travel))
+        return self.mark_job(Job(points, self.position(), max_run))
+
+    def mark_svg(self, svg_file, bounding_box, pitch=.2, max_run=1,
+                 reorder=True):
+        """Marks the shapes of an SVG file stretched to the bounding box
+        (see vector.load_svg) along their outlines, see mark_polylines."""
+        return BaseMarker.mark_polylines(
+            self, vector.load_svg(svg_file, bounding_box), pitch, max_run,
+            reorder)
+
+    def plan(self, points, order='2opt', max_run=1, start=None):
+        """Orders needle points starting at start, by default the current
+        position, and returns them as Job."""
+        if start is None:
+            start = self.position()
+        if self.workers and len(points) >= self.parallel_min_points:
+            # other processes don't compete with the sender for the GIL
+            with concurrent.futures.ProcessPoolExecutor(self.workers) as \
+                    executor:
+                return plan(points, order, max_run, start, executor)
+        return plan(points, order, max_run, start)
+
+    def mark_job(self, job):
+        """Queues a Job after checking it against the machine limits."""
+        if not job.in_bounds(self.MAX_X, self.MAX_Y):
+            self.emergency_off('needle points out of bounds.')
+        if job.start != self.position():
+            # the head moved since the job was planned
+            job = Job(None, self.position(), job.max_run, job.pitch,
+                      job.runs, job.speeds, job.base_speed, job.positions)
+        if self.speed_profile is not None:
+            job = BaseMarker.profile_job(self, job)
+        logging.info('%d strokes; estimated marking time %s.' % (
+            len(job.runs), timedelta(seconds=int(BaseMarker.estimate(self,
+                                                                     job)))))
+
+        sent = self._send_job(job)
+        self.__x, self.__y = job.end
+        return sent
+
+    def profile_job(self, job):
+        """Returns the Job with travel speeds from speed_profile, never
+        faster than the controller's *VM limit."""
+        model = self.estimator.model
+        speeds = self.speed_profile.speeds(job, model.max_speed, self.MAX_X,
+                                           self.MAX_Y)
+        if not (speeds != model.speed).any():
+            return job
+        logging.info('Speed profile: %.1f s saved over %d steps/s of INIT.'
+                     % (self.speed_profile.time_saved(model, job, speeds,
+                                                      model.speed),
+                        model.speed))
+        return Job(None, job.start, job.max_run, job.pitch, job.runs,
+                   speeds, model.speed, job.positions)
+
+    def resume(self, job, checkpoint_file=None):
+        """Homes and marks the strokes of a Job which a checkpoint file
+        (default: checkpoint_file) does not record as acknowledged. A
+        stroke interrupted after its move may be struck again."""
+        path = checkpoint_file or self.checkpoint_file
+        first = checkpoint.load(path, job)
+        logging.info('Resuming at point %d of %d.' % (first, len(job)))
+        BaseMarker.home(self)
+        self.__resuming = (checkpoint.job_key(job), first)
+        return self.mark_job(job.remaining(first, self.position()))
+
+    def save_job(self, path, job):
+        """Writes a Job to a job file for this machine (see jobfile)."""
+        jobfile.write(path, job, self.MAX_X, self.MAX_Y, self.slow_motion)
+
+    def load_job(self, path):
+        """Returns the Job of a job file, starting at the current position.
+        Files compiled for other machine limits are refused."""
+        job_file = jobfile.JobFile(path)
+        if (job_file.max_x, job_file.max_y) != (self.MAX_X, self.MAX_Y):
+            raise Exception('%s was compiled for a %.2f x %.2f mm plate.' %
+                            (path, job_file.max_x, job_file.max_y))
+        if job_file.slow_motion != self.slow_motion:
+            logging.warning('%s was compiled for another speed.' % path)
+        return job_file.job(self.position())
+
+    def estimate(self, job=None):
+        """Returns predicted seconds a Job takes, without job the remaining
+        seconds until all queued commands are done (see
+        estimator.Estimator)."""
+        if job is not None:
+            return float(self.estimator.model.job_times(job).sum())
+        return self.estimator.remaining(self.count['ST'].done)
+
+    def pending_points(self):
+        """Returns (N, 2) array of needle points in mm which are queued but
+        not sent yet, starting from the home position."""
+        chunks = []
+        position = (0, 0)
+        text = ''
+        for part in self.queue.pending_parts() + [None]:
+            if isinstance(part, str):
+                # a command may span datagrams, so parse text runs as a whole
+                text += part
+                continue
+            points, position = follow(text, position)
+            chunks.append(np.array(points, dtype=float).reshape(-1, 2))
+            text = ''
+            if part is not None:
+                chunks.append(part.pending_points())
+                position = part.end
+        return np.vstack(chunks)
+
+    def preview(self, rds=10, preview_file='preview.png', resolution=100,
+                mode='RGB', region=None):
+        """Preview marking points in png before marking starts. The image
+        has resolution pixels per mm and dots of radius rds pixels, see
+        preview.render for mode and region."""
+        points = self.pending_points()
+        for axis, limit in ((0, self.MAX_X), (1, self.MAX_Y)):
+            outside = (points[:, axis] < 0) | (points[:, axis] > limit)
+            assert not outside.any(), '%s value %02.2f not in range.' % \
+                ('xy'[axis], points[outside, axis][0])
 
         # we'll work with large image sizes, so it's better to disable warnings
         warnings.simplefilter('ignore', Image.DecompressionBombWarning)
 
-        im = Image.new('RGB', (int(self.MAX_X*100), int(self.MAX_Y*100)),
-                       white)
-        draw = ImageDraw.Draw(im)
-
-        # use regular expressions to prevent marking failures
-        move_re = re.escape(MOVE).replace('\\%02\\.2f', '(\-?\d+\.\d\d)')
-        move_re_cmpld = re.compile(move_re)
-        x, y = (0, 0)
-        pos = 0
-
-        # find needle down commands
-        for n in re.finditer(re.escape(NEEDLE), self.write_buf):
-            # search for move commands between last and current needle down
-            for move in move_re_cmpld.findall(self.write_buf[pos:n.start()]):
-                x_rel, y_rel = move
-                x += float(x_rel)
-                y += float(y_rel)
-
-                x = round(x, 2)
-                y = round(y, 2)
-
-                assert 0 <= x <= self.MAX_X, 'x value %02.2f not in range.' % x
-                assert 0 <= y <= self.MAX_Y, 'y value %02.2f not in range.' % y
-
-            pos = n.start()
-            # draw marking point with given radius
-            draw.ellipse((x*100-rds, y*100-rds, x*100+rds, y*100+rds), black)
-
+        im = preview.render(points, (self.MAX_X, self.MAX_Y), resolution,
+                            rds, mode, region)
         im.save(preview_file)
 
     def user_confirmation(self, question):
@@ -286,28 +650,105 @@ class Marker(threading.Thread):
 
         return False
 
+
+class Marker(BaseMarker, threading.Thread):
+    """Borries marker representation."""
+    daemon = True
+    running = True
+
+    # seconds without writes before a heartbeat is sent
+    heartbeat_interval = .1
+
+    def __init__(self, device, slow_motion=False, log_level=logging.DEBUG,
+                 high_water=1024, window=4, job_cache=None, workers=None,
+                 batch_bytes=None, setup=True):
+
+        """Initializes marker and moves to home position unless setup is
+        False (see connection.ConnectionManager). Producers block while
+        high_water datagrams are waiting to be sent, the sender keeps at
+        most window commands unacknowledged."""
+        BaseMarker.__init__(self, high_water, window, job_cache, workers,
+                            batch_bytes)
+        threading.Thread.__init__(self)
+        self.lock = threading.RLock()
+        logging.basicConfig(level=log_level,
+                            format='%(asctime)s %(levelname)-8s %(message)s',
+                            datefmt='%H:%M:%S')
+        self.device = device
+        self.__serial = serial.Serial(device, timeout=0)
+        if setup:
+            self.initialize(slow_motion)
+
+    def close(self):
+        """Stops the thread and closes the port."""
+        self.running = False
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        self.__serial.close()
+
+    def read(self, size=102400):
+        """Reads given amount of bytes in buffer and logs them."""
+        start = time.perf_counter()
+        self.feed(self.__serial.read(size))
+        self.metrics.histograms['read_seconds'].observe(
+            time.perf_counter() - start)
+
+    def emergency_off(self, cause='client'):
+        """Stops the thread, then drops all queued commands, sends
+        emergency off sequence and raises an Exception."""
+        # the sender must not queue heartbeats into the closed queue
+        self.running = False
+        BaseMarker.emergency_off(self, cause)
+
+    def _emergency_off(self, err):
+        """Sends emergency off sequence."""
+        # do not use write buffer, send directly
+        self.__serial.write(EMERGENCY_OFF.encode())
+        self.__serial.flush()
+
     def run(self):
         """Thread loop."""
 
-        while self.running:
-            if ';;' not in self.write_buf:
-                # send heartbeat when there's nothing else to do
-                with self.lock:
-                    self.write_buf += ';*SH;;*SH;'
-
-            # write/read commands to/from buffer
-            while ';;' in self.write_buf and self.running:
-                with self.lock:
-                    datagram, self.write_buf = self.write_buf.split(';;', 1)
-                    self.__serial.write((';%s;' % datagram).encode())
-                    logging.debug('write: ;%s;' % datagram)
-                    self.read()
-                    self.__serial.flush()
-
-            time.sleep(.1)
+        loop = ioloop.SerialLoop(self.__serial)
+        self.queue.on_change = loop.wake
+        next_heartbeat = time.time()
+
+        try:
+            while self.running:
+                # only wait for the port to be writable if there is
+                # something to send and the controller has room for more
+                # commands
+                sendable = len(self.queue) and self.in_flight() < self.window
+                timeout = max(next_heartbeat - time.time(), 0)
+                readable, writable = loop.wait(sendable, timeout)
+
+                if readable:
+                    with self.lock:
+                        self.read()
+
+                if writable:
+                    datagram = self._next_datagram()
+                    if datagram is not None:
+                        with self.lock:
+                            self.__serial.write(datagram)
+                            self._written(datagram)
+                        next_heartbeat = time.time() + self.heartbeat_interval
+
+                if time.time() >= next_heartbeat:
+                    # send heartbeat when there was nothing else to do
+                    if not self.queue:
+                        self.queue.put(';*SH;;*SH;')
+                    next_heartbeat = time.time() + self.heartbeat_interval
+
+                self._export_metrics()
+                self._save_checkpoint()
+        finally:
+            # also when the port fails
+            self._save_checkpoint(force=True)
+        self._export_metrics(force=True)
+        self.queue.on_change = None
+        loop.close()
         logging.debug("AND WE ARE DONE!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-        time.sleep(3)
-        quit()
 
 
 if __name__ == '__main__':
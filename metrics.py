@@ -0,0 +1,225 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import bisect
+import collections
+import os
+import tempfile
+import time
+
+# histogram buckets in seconds
+LATENCY_BUCKETS = (.0001, .0005, .001, .005, .01, .05, .1, .25, .5, 1, 2.5,
+                   5, 10)
+# histogram buckets in datagrams
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 64, 256, 1024)
+
+
+class Histogram(object):
+    """Counts observed values in buckets with the given upper bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """Initialization with sorted upper bucket bounds."""
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Adds a value."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """Returns dict of cumulative bucket counts, sum and count."""
+        buckets = collections.OrderedDict()
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets[bound] = total
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class TimedLock(object):
+    """Lock wrapper measuring the time waited for and spent in the lock.
+
+    Wrapping an RLock, it can be the lock of a threading.Condition: while
+    the condition waits, the lock counts as released."""
+
+    def __init__(self, lock, wait, hold):
+        """Initialization with the lock and two Histograms."""
+        self.lock = lock
+        self.wait = wait
+        self.hold = hold
+        self.__acquired = []
+
+    def acquire(self, *args, **kwargs):
+        """Acquires the lock (see threading.Lock.acquire)."""
+        start = time.perf_counter()
+        acquired = self.lock.acquire(*args, **kwargs)
+        if acquired:
+            now = time.perf_counter()
+            self.wait.observe(now - start)
+            self.__acquired.append(now)
+        return acquired
+
+    def release(self):
+        """Releases the lock."""
+        self.hold.observe(time.perf_counter() - self.__acquired.pop())
+        self.lock.release()
+
+    def _is_owned(self):
+        """True if the current thread holds the lock (for Condition)."""
+        return self.lock._is_owned()
+
+    def _release_save(self):
+        """Releases the lock completely before a Condition waits."""
+        now = time.perf_counter()
+        while self.__acquired:
+            self.hold.observe(now - self.__acquired.pop())
+        return self.lock._release_save()
+
+    def _acquire_restore(self, state):
+        """Acquires the lock again after a Condition was notified."""
+        start = time.perf_counter()
+        self.lock._acquire_restore(state)
+        now = time.perf_counter()
+        self.wait.observe(now - start)
+        # the recursion level of the RLock
+        self.__acquired.extend([now] * state[0])
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class Metrics(object):
+    """Counters, gauges and histograms of the marker's hot paths.
+
+    Updating them costs a few clock reads and a bisect, so they are always
+    on. snapshot() returns all values, prometheus() formats them in the
+    Prometheus text format."""
+    # answers taken into account for the completion rates
+    rate_window = 64
+
+    def __init__(self):
+        """Initializes all metrics at zero."""
+        self.counters = collections.OrderedDict(
+            (name, 0) for name in ('bytes_in', 'bytes_out', 'writes'))
+        self.answers = collections.Counter()
+        self.histograms = collections.OrderedDict((
+            # from a write until its last answer
+            ('round_trip_seconds', Histogram()),
+            ('read_seconds', Histogram()),
+            # pulling the next datagram, including encoding of jobs
+            ('get_seconds', Histogram()),
+            # the command queue's lock, shared by producers and the sender
+            ('lock_wait_seconds', Histogram()),
+            ('lock_hold_seconds', Histogram()),
+            ('queue_depth', Histogram(DEPTH_BUCKETS)),
+        ))
+        # <name, function returning the current value>
+        self.gauges = collections.OrderedDict()
+        # <answers to wait for, time written> of datagrams in flight
+        self.__in_flight = collections.deque()
+        # <prefix, deque of (time, answers done)>
+        self.__answer_times = {}
+
+    def gauge(self, name, function):
+        """Registers a gauge read at snapshot time."""
+        self.gauges[name] = function
+
+    def timed_lock(self, lock):
+        """Returns lock wrapped to measure lock wait and hold times."""
+        return TimedLock(lock, self.histograms['lock_wait_seconds'],
+                         self.histograms['lock_hold_seconds'])
+
+    def received(self, size):
+        """Counts received bytes."""
+        self.counters['bytes_in'] += size
+
+    def sent(self, size, acks=None):
+        """Counts a write, which is done once acks answers were received
+        in total (None if it is not acknowledged)."""
+        self.counters['bytes_out'] += size
+        self.counters['writes'] += 1
+        if acks is not None:
+            self.__in_flight.append((acks, time.perf_counter()))
+
+    def answered(self, prefix, done):
+        """Counts an answer, done answers of its kind were received in
+        total."""
+        now = time.perf_counter()
+        self.answers[prefix] += 1
+        times = self.__answer_times.get(prefix)
+        if times is None:
+            times = self.__answer_times[prefix] = collections.deque(
+                maxlen=self.rate_window)
+        times.append((now, done))
+        if prefix != 'ST':
+            return
+        round_trip = self.histograms['round_trip_seconds']
+        while self.__in_flight and self.__in_flight[0][0] <= done:
+            round_trip.observe(now - self.__in_flight.popleft()[1])
+
+    def rate(self, prefix):
+        """Answers per second of the given kind over the last
+        rate_window answers."""
+        times = self.__answer_times.get(prefix, ())
+        if len(times) < 2 or times[-1][0] == times[0][0]:
+            return 0.0
+        return (times[-1][1] - times[0][1]) / (times[-1][0] - times[0][0])
+
+    def snapshot(self):
+        """Returns dict of all metrics."""
+        return {
+            'counters': dict(self.counters),
+            'answers': dict(self.answers),
+            'answer_rates': {prefix: self.rate(prefix)
+                             for prefix in self.__answer_times},
+            'gauges': {name: function()
+                       for name, function in self.gauges.items()},
+            'histograms': {name: histogram.snapshot()
+                           for name, histogram in self.histograms.items()},
+        }
+
+    def prometheus(self, prefix='marker'):
+        """Returns all metrics in the Prometheus text format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot['counters'].items():
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            lines.append('%s_%s_total %s' % (prefix, name, value))
+        lines.append('# TYPE %s_answers_total counter' % prefix)
+        for answer, value in sorted(snapshot['answers'].items()):
+            lines.append('%s_answers_total{prefix="%s"} %s' % (prefix, answer,
+                                                              value))
+        lines.append('# TYPE %s_answer_rate gauge' % prefix)
+        for answer, value in sorted(snapshot['answer_rates'].items()):
+            lines.append('%s_answer_rate{prefix="%s"} %s' % (prefix, answer,
+                                                            value))
+        for name, value in snapshot['gauges'].items():
+            lines.append('# TYPE %s_%s gauge' % (prefix, name))
+            lines.append('%s_%s %s' % (prefix, name, value))
+        for name, histogram in snapshot['histograms'].items():
+            lines.append('# TYPE %s_%s histogram' % (prefix, name))
+            for bound, count in histogram['buckets'].items():
+                lines.append('%s_%s_bucket{le="%s"} %d' % (
+                    prefix, name, '+Inf' if bound == float('inf') else bound,
+                    count))
+            lines.append('%s_%s_sum %s' % (prefix, name, histogram['sum']))
+            lines.append('%s_%s_count %d' % (prefix, name,
+                                             histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='marker'):
+        """Writes the Prometheus text file atomically, e.g. for the node
+        exporter's textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as prom_file:
+            prom_file.write(self.prometheus(prefix))
+        os.replace(tmp, path)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import re
+import numpy as np
+from protocol import NEEDLE, STROKE_STEP
+
+# INIT parameters of the motion model: <command, attribute>
+PARAMETERS = {
+    'VN': 'speed',          # travel speed in steps/s
+    'VM': 'max_speed',      # highest travel speed in steps/s
+    'VS': 'start_speed',    # speed without acceleration in steps/s
+    'AC': 'acceleration',   # in steps/s²
+    'WD': 'needle_down',    # needle settle time in ms
+    'WU': 'needle_up',      # in ms
+}
+PARAMETER_RE = re.compile(r'\*(%s)(\d+)' % '|'.join(PARAMETERS))
+STEPS_RE = re.compile(r'\*INITs(\d+\.?\d*)')
+# control characters in front of or after commands
+CONTROL = '\x03\x11\x18'
+
+
+class MotionModel(object):
+    """Timing of the controller's moves.
+
+    Both axes move at the same time, each with a trapezoidal speed profile:
+    starting at start_speed, accelerating up to speed and braking down to
+    start_speed again. The defaults are those of the INIT sequence without
+    slow motion."""
+    steps_per_mm = 100.0
+    speed = 6500
+    max_speed = 6500
+    start_speed = 400
+    acceleration = 90000
+    needle_down = 10
+    needle_up = 10
+
+    @classmethod
+    def from_init(cls, commands):
+        """Returns model with the parameters of an INIT command string."""
+        model = cls()
+        model.update(commands)
+        return model
+
+    def update(self, commands):
+        """Takes over all model parameters set in a command string."""
+        for name, value in PARAMETER_RE.findall(commands):
+            setattr(self, PARAMETERS[name], int(value))
+        for value in STEPS_RE.findall(commands):
+            self.steps_per_mm = float(value)
+
+    def axis_time(self, distance, speed=None):
+        """Returns seconds needed to move one axis distance mm at speed
+        steps/s (default: the model's speed), element-wise for arrays."""
+        steps = np.abs(distance) * self.steps_per_mm
+        speed = self.speed if speed is None else speed
+        v0, v, a = self.start_speed, np.maximum(speed, self.start_speed), \
+            float(self.acceleration)
+        ramp = (v ** 2 - v0 ** 2) / (2 * a)
+        # triangular profile if top speed is never reached
+        peak = np.sqrt(v0 ** 2 + a * np.minimum(steps, 2 * ramp))
+        seconds = np.where(steps >= 2 * ramp,
+                           2 * (v - v0) / a + (steps - 2 * ramp) / v,
+                           2 * (peak - v0) / a)
+        return float(seconds) if np.ndim(seconds) == 0 else seconds
+
+    def move_time(self, dx, dy):
+        """Returns seconds needed for a relative move."""
+        return max(self.axis_time(dx), self.axis_time(dy))
+
+    def strike_time(self, dwell):
+        """Returns seconds for a needle strike waiting dwell ms."""
+        return (self.needle_down + dwell + self.needle_up) / 1000.0
+
+    def duration(self, command, position=(0, 0)):
+        """Returns seconds a single command takes and the head position in
+        mm after it. Commands setting parameters update the model."""
+        x, y = position
+        if command.startswith('*PR'):
+            dx, dy = (float(v) for v in command[3:].split(','))
+            return self.move_time(dx, dy), (round(x + dx, 2),
+                                            round(y + dy, 2))
+        elif command == '*RX':
+            return self.axis_time(x), (0, y)
+        elif command == '*RY':
+            return self.axis_time(y), (x, 0)
+        elif command == 'PD':
+            return self.needle_down / 1000.0, position
+        elif command == 'PU':
+            return self.needle_up / 1000.0, position
+        elif command.startswith('*WT'):
+            return int(command[3:]) / 1000.0, position
+        elif command.startswith('*'):
+            self.update(command)
+        return 0.0, position
+
+    def commands_time(self, commands, position=(0, 0)):
+        """Returns seconds a command string takes, starting at position."""
+        seconds = 0.0
+        for command in commands.split(';'):
+            command_seconds, position = self.duration(command.strip(CONTROL),
+                                                      position)
+            seconds += command_seconds
+        return seconds
+
+    def job_times(self, job, speeds=None):
+        """Returns array of the predicted seconds of every answer of a Job:
+        the move to each stroke, then the stroke. speeds are the travel
+        speeds per stroke, by default the job's or the model's speed."""
+        if not len(job):
+            return np.zeros(0)
+        speeds = job.speeds if speeds is None else speeds
+        times = np.empty(2 * len(job.runs))
+        for first, bounds, steps in job.stroke_chunks():
+            runs = bounds[:-1] - bounds[0]
+            dots = np.diff(bounds)
+            speed = None if speeds is None else \
+                np.repeat(speeds[first:first + len(runs)], dots)
+            steps = steps / 100.0
+            moves = np.maximum(self.axis_time(steps[:, 0], speed),
+                               self.axis_time(steps[:, 1], speed))
+            # moves from dot to dot belong to the stroke
+            strokes = np.add.reduceat(moves, runs) - moves[runs] + \
+                self.commands_time(NEEDLE) + \
+                (dots - 1) * self.commands_time(STROKE_STEP % (0, 0))
+            chunk = times[2 * first:2 * (first + len(runs))]
+            chunk[0::2] = moves[runs]
+            chunk[1::2] = strokes
+        return times
+
+
+class SpeedProfile(object):
+    """Travel speed per stroke, chosen by the length of the move to it.
+
+    classes are pairs of (shortest move in mm, speed in steps/s) in
+    ascending order, e.g. precise hops between neighbouring dots and fast
+    jumps. Within the safety envelope, no stroke is faster than the
+    controller's *VM limit and strokes within margin mm of the plate edges
+    run at the slowest speed."""
+
+    def __init__(self, classes=((0, 2200), (5, 6500)), margin=1.0):
+        """Initialization with the move classes and edge margin in mm."""
+        self.classes = tuple(sorted(classes))
+        self.margin = margin
+
+    def speeds(self, job, limit, max_x, max_y):
+        """Returns array of speeds per stroke of a Job, at most limit
+        steps/s, on a plate of max_x x max_y mm."""
+        if not len(job):
+            return np.zeros(0, dtype=int)
+        lengths, speeds = (np.array(v) for v in zip(*self.classes))
+        chosen = np.empty(len(job.runs), dtype=speeds.dtype)
+        low = self.margin * 100
+        high = np.array((max_x - self.margin, max_y - self.margin)) * 100
+        for first, bounds, steps in job.stroke_chunks():
+            runs = bounds[:-1] - bounds[0]
+            moves = np.abs(steps[runs]).max(axis=1) / 100.0
+            chunk = speeds[np.maximum(np.searchsorted(lengths, moves,
+                                                      'right') - 1, 0)]
+            positions = job.positions[bounds[0]:bounds[-1]]
+            near = ((positions < low) | (positions > high)).any(axis=1)
+            chunk[np.logical_or.reduceat(near, runs)] = speeds.min()
+            chosen[first:first + len(runs)] = chunk
+        return np.minimum(chosen, limit).astype(int)
+
+    def time_saved(self, model, job, speeds, speed):
+        """Returns predicted seconds the speeds per stroke of a Job save
+        over moving at speed steps/s throughout."""
+        constant = np.full(len(job.runs), speed)
+        return float(model.job_times(job, constant).sum() -
+                     model.job_times(job, speeds).sum())
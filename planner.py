@@ -0,0 +1,247 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import math
+import numpy as np
+
+
+# available point orders, from cheapest to best path
+ORDERS = ('raster', 'serpentine', 'nearest', '2opt')
+
+
+def as_points(points):
+    """Returns points as (N, 2) float array in mm."""
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def travel_length(points, start=(0, 0)):
+    """Returns the head travel in mm from start through all points."""
+    points = as_points(points)
+    if not len(points):
+        return 0.0
+    path = np.vstack((np.asarray(start, dtype=float), points))
+    steps = np.diff(path, axis=0)
+    return float(np.hypot(steps[:, 0], steps[:, 1]).sum())
+
+
+def serpentine(points):
+    """Orders points column by column, alternating the y direction
+    (boustrophedon)."""
+    points = as_points(points)
+    if not len(points):
+        return points.copy()
+    # points of one raster column share the same (rounded) x value
+    _, column = np.unique(np.round(points[:, 0], 2), return_inverse=True)
+    y = np.where(column % 2, -points[:, 1], points[:, 1])
+    return points[np.lexsort((y, column))]
+
+
+class GridIndex(object):
+    """Spatial hash of point indices used for nearest neighbour lookups."""
+    # rings to search before falling back to a full scan
+    max_rings = 8
+
+    def __init__(self, points, cell_size):
+        """Sorts points into square cells of given size in mm."""
+        self.points = points
+        self.cell_size = float(cell_size)
+        self.alive = np.ones(len(points), dtype=bool)
+        self.remaining = len(points)
+        self.cells = {}
+        # plain lists are a lot faster than numpy scalars in the hot loop
+        self.xy = points.tolist()
+        self.keys = [tuple(key) for key in
+                     np.floor(points / self.cell_size).astype(int).tolist()]
+        for idx, key in enumerate(self.keys):
+            self.cells.setdefault(key, []).append(idx)
+
+    def remove(self, idx):
+        """Removes point index from the index."""
+        key = self.keys[idx]
+        cell = self.cells[key]
+        cell.remove(idx)
+        if not cell:
+            del self.cells[key]
+        self.alive[idx] = False
+        self.remaining -= 1
+
+    def __ring(self, cx, cy, r):
+        """Yields cell keys on the square ring with radius r."""
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest(self, x, y):
+        """Returns index of the remaining point closest to (x, y)."""
+        cx = int(math.floor(x / self.cell_size))
+        cy = int(math.floor(y / self.cell_size))
+        best, best_dist = None, float('inf')
+        for r in range(self.max_rings + 1):
+            # unsearched points are at least r - 1 cells away
+            if best is not None and best_dist <= (r - 1) * self.cell_size:
+                return best
+            for key in self.__ring(cx, cy, r):
+                for idx in self.cells.get(key, ()):
+                    px, py = self.xy[idx]
+                    dist = math.hypot(px - x, py - y)
+                    if dist < best_dist:
+                        best, best_dist = idx, dist
+        if best is not None and best_dist <= self.max_rings * self.cell_size:
+            return best
+
+        # sparse area: scan all remaining points
+        candidates = np.flatnonzero(self.alive)
+        dist = np.hypot(self.points[candidates, 0] - x,
+                        self.points[candidates, 1] - y)
+        return int(candidates[np.argmin(dist)])
+
+
+def nearest_neighbour(points, start=(0, 0), cell_size=None):
+    """Orders points greedily, always moving to the closest unmarked one."""
+    points = as_points(points)
+    if not len(points):
+        return points.copy()
+    if cell_size is None:
+        # aim for a handful of points per cell, also if all points lie in
+        # one row or column and cover no area
+        extent = np.ptp(points, axis=0)
+        cell_size = max(math.sqrt(extent.prod() * 4.0 / len(points)),
+                        extent.max() * 4.0 / len(points), 0.01)
+
+    grid = GridIndex(points, cell_size)
+    order = np.empty(len(points), dtype=int)
+    x, y = start
+    for i in range(len(points)):
+        idx = grid.nearest(x, y)
+        grid.remove(idx)
+        order[i] = idx
+        x, y = grid.xy[idx]
+    return points[order]
+
+
+def two_opt(points, start=(0, 0), window=32, passes=3):
+    """Improves an ordered open path by reversing segments (2-opt).
+
+    Raster points are at least one pitch apart, so swapping two edges can
+    only pay off if one of them is longer than that. Only such long edges
+    are tried, against partners at most window positions away, which keeps
+    a pass close to linear in the number of points."""
+    path = np.vstack((np.asarray(start, dtype=float), as_points(points)))
+    n = len(path) - 1
+    if n < 3:
+        return path[1:]
+
+    def edge(i):
+        return math.hypot(*(path[i + 1] - path[i]))
+
+    for _ in range(passes):
+        steps = np.diff(path, axis=0)
+        lengths = np.hypot(steps[:, 0], steps[:, 1])
+        if not lengths.any():
+            # all points at the start
+            break
+        threshold = 2 * lengths[lengths > 0].min()
+        improved = False
+        for p in np.flatnonzero(lengths > threshold).tolist():
+            if edge(p) <= threshold:
+                continue
+            # edge p is either the first or the second edge of the swap
+            for i, js in ((p, np.arange(p + 2, min(p + window, n) + 1)),
+                          (None, np.arange(max(p - window, 0), p - 1))):
+                if not len(js):
+                    continue
+                if i is None:
+                    # p is the second edge (j); candidates are first edges
+                    a, b = path[js], path[js + 1]
+                    c, d = path[p], path[p + 1]
+                    gain = np.hypot(*(b - a).T) + edge(p) - \
+                        np.hypot(*(c - a).T) - np.hypot(*(d - b).T)
+                else:
+                    a, b = path[i], path[i + 1]
+                    c = path[js]
+                    # the path is open: reversing up to the last point has
+                    # no outgoing edge
+                    d = path[np.minimum(js + 1, n)]
+                    open_end = js == n
+                    gain = edge(i) + \
+                        np.where(open_end, 0, np.hypot(*(d - c).T)) - \
+                        np.hypot(*(c - a).T) - \
+                        np.where(open_end, 0, np.hypot(*(d - b).T))
+                best = int(np.argmax(gain))
+                if gain[best] > 1e-9:
+                    if i is None:
+                        i, j = int(js[best]), p
+                    else:
+                        j = int(js[best])
+                    path[i + 1:j + 1] = path[i + 1:j + 1][::-1].copy()
+                    improved = True
+                    break
+        if not improved:
+            break
+    return path[1:]
+
+
+def tile_grid(points, tiles=4):
+    """Returns index arrays of the points in each non-empty cell of a tiles
+    x tiles grid over their extent. Cells are visited column by column,
+    alternating the direction like serpentine."""
+    points = as_points(points)
+    if not len(points):
+        return []
+    low = points.min(axis=0)
+    size = np.maximum(np.ptp(points, axis=0) / tiles, 1e-9)
+    col, row = np.minimum(((points - low) / size).astype(int), tiles - 1).T
+    row = np.where(col % 2, tiles - 1 - row, row)
+    cell = col * tiles + row
+    order = np.argsort(cell, kind='mergesort')
+    bounds = np.searchsorted(cell[order], np.arange(tiles ** 2 + 1))
+    return [order[first:last] for first, last in zip(bounds[:-1], bounds[1:])
+            if last > first]
+
+
+def order_tiled(points, method='2opt', start=(0, 0), tiles=4,
+                executor=None):
+    """Orders the points of every cell of a tile_grid on its own and joins
+    the paths, e.g. to order the cells in parallel with a process pool
+    executor (see iter_tiled)."""
+    paths = list(iter_tiled(points, method, start, tiles, executor))
+    return np.vstack(paths) if paths else as_points(points).copy()
+
+
+def iter_tiled(points, method='2opt', start=(0, 0), tiles=4,
+               executor=None):
+    """Yields the ordered paths of the cells of a tile_grid in the order
+    they are visited, each as soon as it is ordered.
+
+    A cell's path starts close to the center of the previous cell and is
+    reversed if its end is closer to where the path so far ends."""
+    points = as_points(points)
+    cells = [points[idx] for idx in tile_grid(points, tiles)]
+    starts = [tuple(start)] + [tuple(cell.mean(axis=0)) for cell in cells[:-1]]
+    mapper = map if executor is None else executor.map
+
+    x, y = start
+    for path in mapper(order_points, cells, [method] * len(cells), starts):
+        if math.hypot(*(path[-1] - (x, y))) < math.hypot(*(path[0] - (x, y))):
+            path = path[::-1]
+        x, y = path[-1]
+        yield path
+
+
+def order_points(points, method='2opt', start=(0, 0)):
+    """Returns points ordered by the given method (see ORDERS)."""
+    if method == 'raster':
+        return as_points(points)
+    elif method == 'serpentine':
+        return serpentine(points)
+    elif method == 'nearest':
+        return nearest_neighbour(points, start)
+    elif method == '2opt':
+        return two_opt(nearest_neighbour(points, start), start)
+    raise ValueError('Unknown point order %s.' % method)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import numpy as np
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+
+# dots stamped at once by render
+STAMP_CHUNK = 4096
+
+
+def stamp(radius):
+    """Returns pixel offsets (dx, dy) of a dot with given radius."""
+    r = int(np.ceil(radius))
+    dx, dy = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    return dx[inside], dy[inside]
+
+
+def render(points, size, resolution=100, radius=10, mode='RGB',
+           region=None):
+    """Renders needle points (N, 2 array in mm) as black dots on white.
+
+    size is the plate size in mm, resolution the output pixels per mm and
+    radius the dot radius in output pixels. mode is any Pillow mode, '1'
+    and 'L' keep the image small. region (x0, y0, x1, y1) in mm renders
+    only that tile of the plate."""
+    if region is None:
+        region = (0, 0) + tuple(size)
+    x0, y0, x1, y1 = region
+    width = int(round((x1 - x0) * resolution))
+    height = int(round((y1 - y0) * resolution))
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    pixels = np.rint((points - (x0, y0)) * resolution).astype(np.int64)
+    # dots off the tile may still reach into it
+    r = int(np.ceil(radius))
+    px, py = pixels[:, 0] + r, pixels[:, 1] + r
+    inside = (px >= 0) & (px < width + 2 * r) & \
+        (py >= 0) & (py < height + 2 * r)
+    px, py = px[inside], py[inside]
+    dx, dy = stamp(radius)
+    if len(px) * len(dx) < width * height:
+        # few dots, stamp the pixels of each one
+        for start in range(0, len(px), STAMP_CHUNK):
+            x = (px[start:start + STAMP_CHUNK, np.newaxis] - r + dx).ravel()
+            y = (py[start:start + STAMP_CHUNK, np.newaxis] - r + dy).ravel()
+            on = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            canvas[y[on], x[on]] = 0
+    else:
+        # dense dots, stamp the hit mask with shifted slices
+        mask = np.zeros((height + 2 * r, width + 2 * r), dtype=bool)
+        mask[py, px] = True
+        dots = np.zeros((height, width), dtype=bool)
+        for x, y in zip(dx, dy):
+            dots |= mask[r - y:r - y + height, r - x:r - x + width]
+        canvas[dots] = 0
+
+    img = Image.fromarray(canvas, 'L')
+    if mode != 'L':
+        img = img.convert(mode)
+    return img
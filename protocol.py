@@ -0,0 +1,35 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+# command sequences of the Borries controller
+INIT = '*SQ;;*SQ;;*SQ;*CB;*INITstn;*INITzn;*DB;*CPa;*SE;*CPz;*CPd;' \
+        '*CPa;*SE;*INITp301;*OI;;*CPa;*RTEOF;*SE;*INITwn;*INITgn;*INITppn,' \
+        'pj;*INITzpj;*INITzn;*INITd16,0,5,500,20000;*INITdx15,0,30;*WD10;' \
+        '*WU10;*SE;*INITs100.00,100.00;*INITo-100,-100;;*INITno0,0;*INITrd+,' \
+        '+;*INITrr+,+;*INITrs+,+;LO1;*LBn;*INITesn,n;*INITze-,-;*VM6500,' \
+        '6500;*VN%d,%d;*VS400,400;*SE;*VB%d;*VH600,600;*VP600,600;*VC600,' \
+        '600;*SE;;*AC90000,90000;*LBd0.00;*LBm1.4,1.16;;*INITn1;;*INITxqrap;' \
+        ';*INITxp5;*INITzs0;;*INITaen,asn,adj;*MO18E1,9600;*CPa;*SE;;' \
+        '*INITbeL,0,beL,1,beL,2,beH,3,beL,4,beH,5,beH,6,beL,7,beL,8,beL,9,' \
+        'beL,10,beL,11,beL,12,beL,13,beL,14,beL,15,beL,16,beL,17,beL,18,beL,' \
+        '19,beL,20,beL,21,beL,22,beL,23,beL,24;*INITbaD,22,baD,21,baD,20,' \
+        'baD,19,baD,18,baD,17,baD,16,baD,15,baD,14,baD,13,baD,12,baD,11,baD,' \
+        '10,baD,9,baD,8,baD,7,baD,6,baD,5,baD,4,baD,3,baD,2,baD,1,ba0,0;*SE;' \
+        ';;;*VP1200,1200;;*CPa;*RTEOF;*SE;CS6;*INITbe0,5;;*CPa;*RTEOF;' \
+        '*SE;;*XRH;;*EB;*SE;;*SH;;*SH;;*SH;;*SH;;PU;;*INITrr+,+;'
+HOME = ';*INITrd+,+;*RX;*RY;*RTHOME;*SH;;*SE;;*OA;;*SH;;*SE;'
+MOVE = ';*PR%02.2f,%02.2f;;*SH;*OA;*SE;'
+EMERGENCY_OFF = ';;*HE;;;'
+NEEDLE = 'SP1;;PD;*WT250;PU;*SE;'
+# needle strikes at a line of adjacent dots, acknowledged once; %s takes
+# one STROKE_STEP per dot after the first
+STROKE = 'SP1;;PD;*WT250;PU;%s*SE;'
+STROKE_STEP = '*PR%02.2f,%02.2f;*OA;PD;*WT250;PU;'
+# commands acknowledged with one answer (two ST lines) when executed
+ACKNOWLEDGED = ('*SE', '*EB')
+# travel speed of both axes and *VB in steps/s, valid until the next
+# change (see job.speed_change)
+SPEED_CHANGE = '*VN%d,%d;*VB%d;'
+# INIT speed parameters (*VN x, *VN y, *VB) in normal and slow motion mode
+SPEED = (6500, 6500, 2200)
+SLOW_SPEED = (650, 650, 220)
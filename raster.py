@@ -0,0 +1,37 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import numpy as np
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+
+def raster_size(bounding_box, granularity):
+    """Returns raster width and height in pixels for the bounding box."""
+    start_x, start_y, end_x, end_y = bounding_box
+    return (int(round((end_x - start_x) * granularity)),
+            int(round((end_y - start_y) * granularity)))
+
+
+def black_pixels(img, dither=True, threshold=128):
+    """Returns boolean array (height, width) of pixels to be marked.
+
+    With dither, gray areas are Floyd-Steinberg dithered, otherwise every
+    pixel darker than threshold (0-255) is black."""
+    if dither:
+        # convert to 'L' again, older Pillow versions can't export mode '1'
+        return np.asarray(img.convert('1').convert('L')) == 0
+    return np.asarray(img.convert('L')) < threshold
+
+
+def rasterize(img, bounding_box, granularity=5, dither=True, threshold=128):
+    """Resizes image to the bounding box and returns the (N, 2) array of
+    needle points in mm, column by column like the raster itself."""
+    start_x, start_y = bounding_box[:2]
+    img = img.resize(raster_size(bounding_box, granularity), Image.LANCZOS)
+    # transposed, so nonzero walks the columns
+    xs, ys = np.nonzero(black_pixels(img, dither, threshold).T)
+    return np.column_stack((start_x + xs / float(granularity),
+                            start_y + ys / float(granularity)))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+from answers import AnswerParser
+
+ACK = b'ST 00 XX 00 60 00 00 00 00 00 00 00 00 00\r'
+HEARTBEAT = b'RSIX800O00\r'
+
+
+class AnswerParserTest(unittest.TestCase):
+    """Performs answer parser tests."""
+    def setUp(self):
+        self.received = []
+        self.parser = AnswerParser({
+            b'ST': lambda answer: self.received.append(answer.tobytes()),
+        })
+
+    def test_split(self):
+        """Tests answers split across reads."""
+        data = ACK + HEARTBEAT + ACK
+        for i in range(0, len(data), 7):
+            self.parser.feed(data[i:i + 7])
+        self.assertEqual(self.received, [ACK[:-1]] * 2)
+        self.assertEqual(self.parser.answers, 3)
+        self.assertEqual(self.parser.pending(), b'')
+
+    def test_pending(self):
+        """Tests that incomplete answers are kept."""
+        self.parser.feed(b'\r\r' + ACK + ACK[:5])
+        self.assertEqual(self.parser.answers, 1)
+        self.assertEqual(self.parser.pending(), ACK[:5])
+
+    def test_register(self):
+        """Tests registering handlers later."""
+        heartbeats = []
+        self.parser.register(b'RS', lambda answer: heartbeats.append(
+            answer.tobytes()), prefix=True)
+        self.parser.feed(HEARTBEAT * 3 + ACK)
+        self.assertEqual(len(heartbeats), 3)
+        self.assertEqual(len(self.received), 1)
+
+    def test_whitespace(self):
+        """Tests that leading whitespace, e.g. of CRLF answers, is
+        skipped."""
+        self.parser.feed(b'ST 01\r\nST 02\r\n ST 03\r\t\n\r')
+        self.assertEqual(self.received, [b'ST 01', b'ST 02', b'ST 03'])
+        self.assertEqual(self.parser.answers, 3)
+
+    def test_first_word(self):
+        """Tests that the whole first word selects the handler."""
+        self.parser.feed(b'STX 01\r' + b'ST\r' + b'STATUS\r' + ACK)
+        self.assertEqual(self.received, [b'ST', ACK[:-1]])
+        self.assertEqual(self.parser.answers, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
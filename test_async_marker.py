@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from async_marker import AsyncMarker
+from emulator import Emulator
+
+
+class AsyncMarkerTest(unittest.TestCase):
+    """Performs AsyncMarker tests on the emulator."""
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.emulator = None
+        self.marker = None
+
+    def tearDown(self):
+        if self.marker is not None:
+            self.marker.close()
+        if self.emulator is not None:
+            self.emulator.stop()
+        self.loop.close()
+
+    def connect(self, speed=None):
+        """Starts an emulator and an AsyncMarker connected to it."""
+        self.emulator = Emulator(speed)
+        self.emulator.start()
+        self.marker = AsyncMarker(self.emulator.device, loop=self.loop)
+        return self.marker.start()
+
+    def run_until(self, coro, timeout=30):
+        """Runs coro on the loop and returns its result."""
+        return self.loop.run_until_complete(asyncio.wait_for(coro, timeout))
+
+    def test_commands(self):
+        """Tests that commands resolve once they are acknowledged."""
+        async def session():
+            await self.connect()
+            await self.marker.move_abs(10, 5)
+            self.assertEqual(self.emulator.position(), (10, 5))
+            await self.marker.needle_down()
+            self.assertEqual(self.emulator.strikes, [(10, 5)])
+            await self.marker.home()
+            self.assertEqual(self.emulator.position(), (0, 0))
+            await self.marker.mark_picture('Logo_quadratisch.png',
+                                           (0, 0, 10, 10), granularity=2)
+            count = self.marker.count['ST']
+            self.assertEqual(count.done, count.tbd)
+
+        self.run_until(session())
+        self.assertGreater(len(self.emulator.strikes), 1)
+        self.assertEqual(self.emulator.setups, 1)
+
+    def test_emergency_off(self):
+        """Tests that commands out of bounds fail the waiting commands."""
+        async def session():
+            # strikes take real time, so some are still waiting
+            await self.connect(speed=1)
+            tasks = [self.loop.create_task(self.marker.needle_down())
+                     for _ in range(20)]
+            await asyncio.sleep(0)
+            with self.assertRaises(Exception):
+                await self.marker.move_abs(self.marker.MAX_X + 1, 0)
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = self.run_until(session())
+        failed = [result for result in results
+                  if isinstance(result, Exception)]
+        self.assertGreater(len(failed), 0)
+        self.assertTrue(all('Emergency off' in str(result)
+                            for result in failed))
+        self.assertTrue(self.emulator.halted)
+        self.assertLess(len(self.emulator.strikes), 20)
+
+    def test_no_confirmation(self):
+        """Tests that images loaded in the executor are not asked about."""
+        async def session():
+            await self.connect()
+            # the logo has fewer pixels than the bounding box needs
+            self.marker.user_confirmation = self.fail
+            return await self.loop.run_in_executor(
+                None, self.marker.load_picture, 'Logo_quadratisch.png',
+                (0, 0, 60, 60), 10)
+
+        self.assertGreater(len(self.run_until(session())), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+import unittest
+import checkpoint
+import jobfile
+from emulated import emulated, wait_answered
+from job import Job
+
+
+class CheckpointTest(unittest.TestCase):
+    """Performs checkpoint and resume tests."""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'job.checkpoint')
+        self.job = Job([(x / 2.0, y / 2.0) for x in range(20, 30)
+                        for y in range(20, 24)], max_run=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key(self):
+        """Tests that a job keeps its identity in a job file."""
+        path = os.path.join(self.directory.name, 'job.bmj')
+        jobfile.write(path, self.job, 100, 100)
+        loaded = jobfile.JobFile(path).job((5, 5))
+        self.assertEqual(checkpoint.job_key(loaded),
+                         checkpoint.job_key(self.job))
+        self.assertNotEqual(checkpoint.job_key(Job(self.job.points)),
+                            checkpoint.job_key(self.job))
+
+    def test_progress(self):
+        """Tests that only acknowledged strokes count."""
+        runs = self.job.runs.tolist()
+        self.assertEqual(checkpoint.progress(self.job, 0), 0)
+        # the move of the first stroke
+        self.assertEqual(checkpoint.progress(self.job, 1), 0)
+        self.assertEqual(checkpoint.progress(self.job, 4), runs[2])
+        self.assertEqual(checkpoint.progress(self.job, self.job.acks),
+                         len(self.job))
+
+        checkpoint.save(self.path, checkpoint.job_key(self.job), runs[3],
+                        len(self.job))
+        self.assertEqual(checkpoint.load(self.path, self.job), runs[3])
+        with self.assertRaises(Exception):
+            checkpoint.load(self.path, Job(self.job.points[1:]))
+
+    def test_remaining(self):
+        """Tests the job of the strokes not marked yet."""
+        first = int(self.job.runs[3])
+        rest = self.job.remaining(first, (1, 1))
+        self.assertEqual(rest.start, (1, 1))
+        self.assertEqual(rest.points.tolist(),
+                         self.job.points[first:].tolist())
+        self.assertEqual(rest.runs.tolist(),
+                         (self.job.runs[3:] - first).tolist())
+        with self.assertRaises(ValueError):
+            self.job.remaining(first + 1)
+
+    def test_resume(self):
+        """Tests resuming after an emergency stop."""
+        # strokes of two dots take about 15 ms at 40 times the speed
+        with emulated(speed=40) as (emulator, marker):
+            marker.checkpoint_file = self.path
+            marker.mark_job(self.job)
+            count = marker.count['ST']
+            while count.done < 14 + 6 and marker.is_alive():
+                time.sleep(.01)
+            with self.assertRaises(Exception):
+                marker.emergency_off('test')
+            marker.join()
+            strikes = list(emulator.strikes)
+        first = checkpoint.load(self.path, self.job)
+        self.assertGreaterEqual(first, self.job.runs[3])
+        self.assertLess(first, len(self.job))
+        # strikes without answers may precede the emergency stop
+        points = [tuple(point) for point in self.job.points.tolist()]
+        self.assertEqual(strikes[:first], points[:first])
+
+        # reconnect to a machine which lost its state
+        with emulated() as (emulator, marker):
+            marker.checkpoint_file = self.path
+            marker.move_abs(30, 30)
+            marker.resume(self.job)
+            self.assertTrue(wait_answered(marker, 20))
+            self.assertEqual(emulator.strikes, points[first:])
+        # the checkpoint still refers to the whole job
+        self.assertEqual(checkpoint.load(self.path, self.job),
+                         len(self.job))
+
+
+if __name__ == '__main__':
+    unittest.main()
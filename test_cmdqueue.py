@@ -0,0 +1,168 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+import time
+from cmdqueue import CommandQueue, QueueClosed
+from job import Job
+from protocol import INIT, HOME, MOVE, NEEDLE
+
+
+class CommandQueueTest(unittest.TestCase):
+    """Performs command queue tests."""
+    def drain(self, queue):
+        """Returns all ready datagrams."""
+        datagrams = []
+        datagram = queue.get()
+        while datagram is not None:
+            datagrams.append(datagram)
+            datagram = queue.get()
+        return datagrams
+
+    def test_datagrams(self):
+        """Tests that datagrams match splitting the former string buffer."""
+        commands = [INIT % (6500, 6500, 2200), HOME, MOVE % (1, 2.5),
+                    NEEDLE, MOVE % (-1, 0), NEEDLE, ';*SH;;*SH;']
+        queue = CommandQueue()
+        for cmd in commands:
+            queue.put(cmd)
+
+        write_buf = ''.join(commands)
+        expected = []
+        while ';;' in write_buf:
+            datagram, write_buf = write_buf.split(';;', 1)
+            expected.append((';%s;' % datagram).encode())
+
+        self.assertEqual(len(queue), len(expected))
+        self.assertEqual(self.drain(queue), expected)
+        self.assertEqual(queue.pending(), write_buf)
+
+    def test_streams(self):
+        """Tests that streams are pulled lazily and keep command order."""
+        job = Job([(1, 1), (2, 1.5), (2, 1)])
+        queue = CommandQueue()
+        queue.put(HOME)
+        queue.put_stream(job)
+        queue.put(MOVE % (-2, -1))
+        queue.put_stream(iter([NEEDLE, NEEDLE]))
+        queue.put(';*SH;;*SH;')
+
+        write_buf = HOME + ''.join(job.commands()) + MOVE % (-2, -1) + \
+            NEEDLE + NEEDLE + ';*SH;;*SH;'
+        expected = []
+        while ';;' in write_buf:
+            datagram, write_buf = write_buf.split(';;', 1)
+            expected.append((';%s;' % datagram).encode())
+
+        # home datagrams are ready, the job is not encoded yet
+        home = HOME.count(';;')
+        for datagram in expected[:home]:
+            self.assertEqual(queue.get(), datagram)
+        self.assertEqual(job.sent, 0)
+        self.assertEqual(queue.get(), expected[home])
+        self.assertEqual(job.sent, 1)
+
+        self.assertEqual(self.drain(queue), expected[home + 1:])
+        self.assertEqual(job.sent, 3)
+        self.assertEqual(queue.pending(), write_buf)
+
+    def test_pending_streams(self):
+        """Tests that pending commands include unpulled streams."""
+        job = Job([(1, 1), (2, 1.5), (3, 1)])
+        queue = CommandQueue()
+        queue.put(HOME)
+        queue.put_stream(job)
+        queue.put(NEEDLE)
+        write_buf = HOME + ''.join(job.commands()) + NEEDLE
+        self.assertEqual(queue.pending(), write_buf)
+
+        # stop in the middle of the job
+        sent = ''
+        for _ in range(HOME.count(';;') + 4):
+            sent += queue.get().decode()[1:-1] + ';;'
+        self.assertEqual(job.sent, 2)
+        self.assertEqual(queue.pending(), write_buf[len(sent):])
+
+    def test_acks(self):
+        """Tests that answers are attached to the acknowledged commands."""
+        queue = CommandQueue()
+        queue.put(MOVE % (1, 1), 1)
+        queue.put(NEEDLE, 1)
+        queue.put_stream(iter([MOVE % (1, 1) + NEEDLE]), 2)
+        queue.put(';*SH;;*SH;')
+        datagrams = self.drain(queue)
+        self.assertEqual([d.acks for d in datagrams],
+                         [0, 1, 1, 0, 1, 1, 0])
+        self.assertEqual(datagrams[1], b';*SH;*OA;*SE;SP1;')
+        self.assertEqual(datagrams[2], b';PD;*WT250;PU;*SE;')
+        self.assertEqual(datagrams[4], b';*SH;*OA;*SE;SP1;')
+        self.assertEqual(datagrams[5], b';PD;*WT250;PU;*SE;')
+
+    def test_high_water(self):
+        """Tests that producers block on a full queue."""
+        queue = CommandQueue(high_water=2)
+        producer = threading.Thread(target=queue.put,
+                                    args=(';a;;b;;c;;d;;',))
+        producer.start()
+        time.sleep(.1)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(len(queue), 2)
+
+        datagrams = []
+        while producer.is_alive() or len(queue):
+            datagram = queue.get()
+            if datagram is not None:
+                datagrams.append(datagram)
+        producer.join()
+        self.assertEqual(datagrams, [b';;a;', b';b;', b';c;', b';d;'])
+
+        stats = queue.stats()
+        self.assertEqual(stats['depth'], 0)
+        self.assertEqual(stats['datagrams_in'], 4)
+        self.assertEqual(stats['datagrams_out'], 4)
+        self.assertEqual(stats['bytes_out'], 13)
+
+    def test_batch(self):
+        """Tests joining datagrams within the byte and answer limits."""
+        queue = CommandQueue()
+        queue.put(';a;;b;;', 1)
+        queue.put(';c;;', 2)
+        queue.put(';d;;e;;f;;', 1)
+        # answers are attached to the datagram after the kept back tail
+        batch = queue.get(max_bytes=100, max_acks=2)
+        self.assertEqual(batch, b';;a;;b;;;c;')
+        self.assertEqual(batch.acks, 1)
+        batch = queue.get(max_bytes=6, max_acks=4)
+        self.assertEqual(batch, b';;d;')
+        self.assertEqual(batch.acks, 2)
+        # one datagram even if it exceeds the limits
+        self.assertEqual(queue.get(max_bytes=1, max_acks=0), b';e;')
+        self.assertEqual(queue.get(), b';f;')
+        stats = queue.stats()
+        self.assertEqual(stats['datagrams_out'], 6)
+        self.assertEqual(stats['writes'], 4)
+
+    def test_close(self):
+        """Tests that closing wakes up blocked producers."""
+        queue = CommandQueue(high_water=1)
+        errors = []
+
+        def produce():
+            try:
+                queue.put(';a;;b;;')
+            except QueueClosed as e:
+                errors.append(e)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        time.sleep(.1)
+        queue.close()
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertIsNone(queue.get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+from connection import ConnectionManager
+from emulated import wait_answered
+from emulator import Emulator, HEARTBEAT
+
+
+class ConnectionManagerTest(unittest.TestCase):
+    """Performs connection manager tests."""
+    def setUp(self):
+        self.emulator = Emulator()
+        self.emulator.start()
+        self.manager = ConnectionManager(self.emulator.device,
+                                         log_level=logging.INFO)
+
+    def tearDown(self):
+        self.manager.close()
+        self.emulator.stop()
+
+    def test_reconnect(self):
+        """Tests that a set up controller is not set up again."""
+        marker = self.manager.connect()
+        self.assertEqual(self.emulator.setups, 1)
+        self.assertIs(self.manager.connect(), marker)
+        marker.move_abs(10, 10)
+        self.assertTrue(wait_answered(marker))
+
+        # the session ends, e.g. the adapter was plugged out
+        marker.close()
+        marker = self.manager.connect()
+        self.assertEqual(self.emulator.setups, 1)
+        self.assertEqual(marker.position(), (10, 10))
+        marker.move_abs(20, 5)
+        self.assertTrue(wait_answered(marker))
+        self.assertEqual(self.emulator.position(), (20, 5))
+
+        # other INIT parameters
+        self.manager.connect(slow_motion=True)
+        self.assertEqual(self.emulator.setups, 2)
+        self.assertEqual(self.manager.setups, 2)
+
+    def test_position_lost(self):
+        """Tests homing when commands were not answered."""
+        marker = self.manager.connect()
+        marker.close()
+        marker.move_abs(10, 10)
+        marker = self.manager.connect()
+        self.assertTrue(wait_answered(marker))
+        self.assertEqual(self.emulator.setups, 1)
+        self.assertEqual(marker.position(), (0, 0))
+        self.assertEqual(self.emulator.position(), (0, 0))
+
+    def test_emergency_off(self):
+        """Tests that a halted controller is set up again."""
+        marker = self.manager.connect()
+        with self.assertRaises(Exception):
+            marker.emergency_off('test')
+        marker = self.manager.connect()
+        self.assertEqual(self.emulator.setups, 2)
+        marker.move_abs(1, 2)
+        self.assertTrue(wait_answered(marker))
+        self.assertEqual(self.emulator.position(), (1, 2))
+
+    def test_emergency_off_alive(self):
+        """Tests that a halted session is not reused while its thread
+        ends."""
+        marker = self.manager.connect()
+        with self.assertRaises(Exception):
+            marker.emergency_off('test')
+        self.assertIsNot(self.manager.connect(), marker)
+        self.assertFalse(marker.is_alive())
+        self.assertEqual(self.emulator.setups, 2)
+
+    def test_status_unknown(self):
+        """Tests that a controller answering the same heartbeat before and
+        after INIT is set up for every session."""
+        self.emulator.heartbeat_not_ready = HEARTBEAT
+        self.manager.connect().close()
+        self.assertIsNone(self.manager.ready_status)
+        # power cycle
+        self.emulator.initialized = False
+        self.manager.connect().close()
+        self.assertEqual(self.emulator.setups, 2)
+
+    def test_no_trust(self):
+        """Tests that every session is set up if the status is not
+        trusted."""
+        self.manager.trust_status = False
+        self.manager.connect().close()
+        self.manager.connect()
+        self.assertEqual(self.emulator.setups, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+import dispatcher
+import marker
+from emulator import Emulator
+
+
+class DispatcherTest(unittest.TestCase):
+    """Performs dispatcher tests on emulated machines."""
+    def setUp(self):
+        self.emulators = [Emulator(), Emulator()]
+        for emulator in self.emulators:
+            emulator.start()
+        self.dispatcher = dispatcher.Dispatcher(
+            [emulator.device for emulator in self.emulators], workers=2,
+            log_level=logging.WARNING)
+        self.dispatcher.start()
+
+    def tearDown(self):
+        self.dispatcher.close()
+        for emulator in self.emulators:
+            emulator.stop()
+
+    def test_compile_picture(self):
+        """Tests compiling a job outside of a marker."""
+        job = marker.compile_picture('Logo_quadratisch.png', (0, 0, 10, 10),
+                                     2, max_run=4)
+        self.assertEqual(job.start, (0, 0))
+        self.assertEqual(len(job), 88)
+
+    def test_jobs(self):
+        """Tests that jobs are distributed to the machines."""
+        futures = [self.dispatcher.submit('Logo_quadratisch.png',
+                                          (x, 0, x + 10, 10), 2, max_run=4)
+                   for x in (0, 20, 40, 60)]
+        missing = self.dispatcher.submit('missing.png', (0, 0, 10, 10))
+        devices = [future.result(30) for future in futures]
+        self.assertEqual(set(devices),
+                         set(emulator.device for emulator in self.emulators))
+        self.assertRaises(IOError, missing.result, 30)
+        self.assertEqual(sum(len(emulator.strikes)
+                             for emulator in self.emulators), 4 * 88)
+        self.assertEqual([status['state']
+                          for status in self.dispatcher.status()],
+                         ['idle', 'idle'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+import serial
+from emulator import Emulator, ACK, HEARTBEAT, HEARTBEAT_NOT_READY, \
+    replay
+from motion import MotionModel
+from protocol import INIT, SPEED, HOME, MOVE, NEEDLE
+
+
+class EmulatorTest(unittest.TestCase):
+    """Performs emulator tests."""
+    def setUp(self):
+        self.emulator = Emulator()
+        self.emulator.start()
+        self.serial = serial.Serial(self.emulator.device, timeout=2)
+
+    def tearDown(self):
+        self.serial.close()
+        self.emulator.stop()
+
+    def read_answer(self):
+        """Reads one answer."""
+        answer = b''
+        while not answer.endswith(b'\r'):
+            char = self.serial.read(1)
+            self.assertTrue(char, 'no answer')
+            answer += char
+        return answer
+
+    def read_acks(self, count):
+        """Reads answers until count ACK lines arrived, returns them."""
+        acks = []
+        while len(acks) < count:
+            answer = self.read_answer()
+            if not answer.startswith(b'RS'):
+                acks.append(answer)
+        return b''.join(acks)
+
+    def test_incremental(self):
+        """Tests commands split across writes."""
+        commands = (';%s;' % (MOVE % (1, 2.5) + NEEDLE)).encode()
+        for i in range(0, len(commands), 5):
+            self.serial.write(commands[i:i + 5])
+            self.serial.flush()
+        self.assertEqual(self.read_acks(4), ACK * 4)
+        self.assertEqual(self.emulator.strikes, [(1, 2.5)])
+
+        self.serial.write(b';*SH;')
+        self.assertEqual(self.serial.read(len(HEARTBEAT_NOT_READY)),
+                         HEARTBEAT_NOT_READY)
+
+    def test_setup(self):
+        """Tests that heartbeats tell whether INIT was done."""
+        self.serial.write((INIT % SPEED + ';').encode())
+        self.assertEqual(self.read_acks(24), ACK * 24)
+        self.assertEqual(self.emulator.setups, 1)
+        self.serial.write(b';*SH;')
+        self.assertEqual(self.read_answer(), HEARTBEAT)
+        # an emergency stop needs a new INIT, INIT's heartbeats may still
+        # be waiting
+        self.serial.write(b';;*HE;;;*SH;')
+        answers = [self.read_answer()]
+        while answers[-1] == HEARTBEAT:
+            answers.append(self.read_answer())
+        self.assertEqual(answers[-1], HEARTBEAT_NOT_READY)
+
+    def test_virtual_clock(self):
+        """Tests that the virtual clock adds up the motion times."""
+        commands = MOVE % (10, 0) + NEEDLE + MOVE % (0, -5) + HOME
+        self.serial.write((';%s;' % commands).encode())
+        self.assertEqual(self.read_acks(8), ACK * 8)
+        model = MotionModel()
+        expected = model.move_time(10, 0) + model.strike_time(250) + \
+            model.move_time(0, 5) + model.axis_time(10) + \
+            model.axis_time(5)
+        self.assertAlmostEqual(self.emulator.clock, expected)
+        self.assertEqual(self.emulator.position(), (0, 0))
+
+
+class ReplayTest(unittest.TestCase):
+    """Performs session log replay tests."""
+    def test_sequences(self):
+        """Tests timing of the captured test moves."""
+        model = MotionModel()
+        expected = 0
+        for distance in (10, 1, .1):
+            expected += 4 * model.axis_time(distance)
+        seconds, strikes = replay('usb-traffic-log/sequences.txt')
+        self.assertAlmostEqual(seconds, expected)
+        self.assertEqual(strikes, [])
+
+
+class RealTimeTest(unittest.TestCase):
+    """Performs emulator tests with scaled time."""
+    def test_speed(self):
+        """Tests that answers wait for the scaled motion time."""
+        emulator = Emulator(speed=10)
+        emulator.start()
+        port = serial.Serial(emulator.device, timeout=2)
+        start = time.time()
+        port.write((';%s;' % NEEDLE).encode())
+        self.assertEqual(port.read(len(ACK) * 2), ACK * 2)
+        elapsed = time.time() - start
+        port.close()
+        emulator.stop()
+        self.assertGreater(elapsed, MotionModel().strike_time(250) / 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
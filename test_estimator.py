@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+import numpy as np
+from emulated import emulated, wait_answered
+from estimator import Estimator
+from job import Job
+from motion import MotionModel, SpeedProfile
+from protocol import INIT, MOVE, NEEDLE
+
+
+class EstimatorTest(unittest.TestCase):
+    """Performs job time estimation tests."""
+    def test_commands(self):
+        """Tests that command strings are predicted by the motion model."""
+        estimator = Estimator()
+        estimator.add_commands(INIT % (650, 650, 220), 12)
+        self.assertEqual(estimator.model.speed, 650)
+        estimator.add_commands(MOVE % (10, 5) + NEEDLE, 2)
+        model = MotionModel.from_init(INIT % (650, 650, 220))
+        self.assertEqual(estimator.answers, 14)
+        self.assertAlmostEqual(estimator.total(),
+                               model.commands_time(INIT % (650, 650, 220)) +
+                               model.move_time(10, 5) +
+                               model.strike_time(250))
+
+    def test_threads(self):
+        """Tests that answers added while the sender predicts are kept."""
+        estimator = Estimator()
+
+        def produce():
+            for _ in range(5000):
+                estimator.add([1.0])
+
+        producers = [threading.Thread(target=produce) for _ in range(2)]
+        for producer in producers:
+            producer.start()
+        while any(producer.is_alive() for producer in producers):
+            estimator.remaining(estimator.answers // 2)
+        for producer in producers:
+            producer.join()
+        self.assertEqual(estimator.answers, 10000)
+        self.assertEqual(estimator.total(), 10000)
+
+    def test_job(self):
+        """Tests the prediction of strokes."""
+        model = MotionModel()
+        job = Job([(1, 1), (1, 1.2), (1, 1.4), (5, 5)], max_run=8)
+        self.assertTrue(np.allclose(model.job_times(job), [
+            model.move_time(1, 1),
+            3 * model.strike_time(250) + 2 * model.move_time(0, .2),
+            model.move_time(4, 3.6),
+            model.strike_time(250),
+        ]))
+
+    def test_observe(self):
+        """Tests that observed answer timings scale the remaining time."""
+        estimator = Estimator()
+        estimator.add([1] * 20)
+        self.assertEqual(estimator.remaining(0), 20)
+        estimator.observe(0, now=100)
+        estimator.observe(10, now=120)
+        # 20 s passed for 10 predicted, blended with 10 s of the model
+        self.assertAlmostEqual(estimator.scale, 30 / 20.0)
+        self.assertAlmostEqual(estimator.remaining(10), 15)
+
+    def test_emulator(self):
+        """Tests the prediction against the emulated machine."""
+        with emulated() as (emulator, marker):
+            job = Job([(x / 5.0, y / 5.0) for x in range(1, 40)
+                       for y in range(1, 40, 3)], max_run=4)
+            # INIT may already be answered, so not marker.estimate()
+            predicted = marker.estimate(job) + marker.estimator.total()
+            marker.mark_job(job)
+            self.assertTrue(wait_answered(marker))
+            self.assertAlmostEqual(emulator.clock, predicted, 3)
+
+    def test_speed_profile(self):
+        """Tests the prediction of a job with speed changes against the
+        emulated machine."""
+        with emulated() as (emulator, marker):
+            marker.speed_profile = SpeedProfile()
+            job = Job([(x, y) for x in (10, 10.2, 60, 60.2)
+                       for y in (10, 10.2, 60, 60.2)])
+            marker.mark_job(job)
+            predicted = marker.estimator.total()
+            self.assertTrue(wait_answered(marker))
+            self.assertEqual(len(emulator.strikes), 16)
+            self.assertAlmostEqual(emulator.clock, predicted, 3)
+            self.assertEqual(emulator.model.speed, 6500)
+            # bounds are checked before the speeds are chosen
+            with self.assertRaises(Exception):
+                marker.mark_job(Job([(10, 10), (200, 10)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import threading
+import time
+from ioloop import SerialLoop
+
+
+class Port(object):
+    """Pipe end standing in for a serial port."""
+    def __init__(self, fd):
+        self.fd = fd
+
+    def fileno(self):
+        return self.fd
+
+
+class SerialLoopTest(unittest.TestCase):
+    """Performs I/O loop tests."""
+    def setUp(self):
+        """Prepare a pipe and a loop waiting on its read end."""
+        self.read_fd, self.write_fd = os.pipe()
+        self.loop = SerialLoop(Port(self.read_fd))
+
+    def tearDown(self):
+        """Close loop and pipe."""
+        self.loop.close()
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def test_timeout(self):
+        """Tests that waiting without events times out."""
+        self.assertEqual(self.loop.wait(timeout=.01), (False, False))
+
+    def test_readable(self):
+        """Tests that waiting returns as soon as data arrives."""
+        threading.Timer(.05, os.write, (self.write_fd, b'ST')).start()
+        start = time.time()
+        self.assertEqual(self.loop.wait(timeout=5), (True, False))
+        self.assertLess(time.time() - start, 1)
+
+    def test_wake(self):
+        """Tests that wake interrupts a wait."""
+        threading.Timer(.05, self.loop.wake).start()
+        start = time.time()
+        self.assertEqual(self.loop.wait(timeout=5), (False, False))
+        self.assertLess(time.time() - start, 1)
+        # the wake-up is consumed
+        self.assertEqual(self.loop.wait(timeout=.01), (False, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+from job import Job, needle_points
+from protocol import MOVE, NEEDLE, STROKE, STROKE_STEP, SPEED_CHANGE
+
+
+class JobTest(unittest.TestCase):
+    """Performs job encoding tests."""
+    def test_commands(self):
+        """Tests relative moves between the points."""
+        job = Job([(1, 2), (1.5, 2), (0.25, 0)], start=(1, 1))
+        self.assertEqual(len(job), 3)
+        self.assertEqual(list(job.commands()), [
+            MOVE % (0, 1) + NEEDLE,
+            MOVE % (.5, 0) + NEEDLE,
+            MOVE % (-1.25, -2) + NEEDLE,
+        ])
+        self.assertEqual(job.end, (.25, 0))
+
+    def test_no_drift(self):
+        """Tests that rounded relative moves add up to the exact target."""
+        points = [(i / 3.0, i / 7.0) for i in range(1, 300)]
+        job = Job(points)
+        x, y = 0, 0
+        for dx, dy in job.steps.tolist():
+            x += dx
+            y += dy
+        self.assertEqual((x / 100.0, y / 100.0), job.end)
+        self.assertEqual(job.end, (round(299 / 3.0, 2), round(299 / 7.0, 2)))
+
+    def test_lazy(self):
+        """Tests that iterating only encodes pulled points."""
+        job = Job([(1, 1), (2, 2), (3, 3)])
+        commands = iter(job)
+        next(commands)
+        self.assertEqual(job.sent, 1)
+        self.assertEqual(job.pending(), ''.join(job.commands(1)))
+
+    def test_strokes(self):
+        """Tests that lines of adjacent dots are marked as strokes."""
+        points = [(1, 1), (1, 1.2), (1, 1.4), (1, 1.6), (1.2, 1.6),
+                  (1.4, 1.6), (3, 3), (3.2, 3.2)]
+        job = Job(points, max_run=3)
+        self.assertEqual(job.runs.tolist(), [0, 3, 6, 7])
+        self.assertEqual(job.acks, 8)
+        commands = list(job.commands())
+        self.assertEqual(commands[0], MOVE % (1, 1) + STROKE % (
+            STROKE_STEP % (0, .2) + STROKE_STEP % (0, .2)))
+        self.assertEqual(commands[3], MOVE % (.2, .2) + NEEDLE)
+
+        # strokes strike exactly the same dots
+        self.assertEqual(needle_points(job.pending()), points)
+        self.assertEqual(needle_points(Job(points).pending()), points)
+
+    def test_stroke_progress(self):
+        """Tests that pulled strokes count all of their points as sent."""
+        points = [(1, y / 10.0) for y in range(10, 20)]
+        job = Job(points, max_run=4)
+        commands = iter(job)
+        next(commands)
+        self.assertEqual(job.sent, 4)
+        self.assertEqual(needle_points(job.pending(), (1, 1.3)), points[4:])
+        self.assertEqual(len(list(commands)), 2)
+        self.assertEqual(job.pending(), '')
+
+    def test_in_bounds(self):
+        """Tests machine limit checks."""
+        self.assertTrue(Job([(0, 0), (10, 5)]).in_bounds(10, 5))
+        self.assertFalse(Job([(0, 0), (10.01, 5)]).in_bounds(10, 5))
+        self.assertFalse(Job([(-1, 0)]).in_bounds(10, 5))
+
+    def test_speeds(self):
+        """Tests that speed changes precede the moves of their strokes."""
+        job = Job([(1, 1), (1.2, 1), (20, 20), (20.2, 20)],
+                  speeds=[2200, 2200, 6500, 2200], base_speed=6500)
+        commands = list(job)
+        self.assertEqual(commands[0], SPEED_CHANGE % (2200, 2200, 745) +
+                         MOVE % (1, 1) + NEEDLE)
+        self.assertEqual(commands[1], MOVE % (.2, 0) + NEEDLE)
+        self.assertEqual(commands[2], SPEED_CHANGE % (6500, 6500, 2200) +
+                         MOVE % (18.8, 19) + NEEDLE)
+        # the base speed is restored after the job
+        self.assertEqual(commands[3], SPEED_CHANGE % (2200, 2200, 745) +
+                         MOVE % (.2, 0) + NEEDLE +
+                         SPEED_CHANGE % (6500, 6500, 2200))
+        self.assertEqual(needle_points(''.join(commands)),
+                         [(1, 1), (1.2, 1), (20, 20), (20.2, 20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
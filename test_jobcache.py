@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import jobcache
+from marker import BaseMarker, compile_picture
+
+
+class JobCacheTest(unittest.TestCase):
+    """Performs job cache tests."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lru(self):
+        """Tests that the least recently used entry is evicted."""
+        cache = jobcache.JobCache(capacity=2)
+        for key in 'abc':
+            if key == 'c':
+                # a becomes the most recently used entry
+                cache.get('a')
+            cache.put(key, [(1, 2)], [0])
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_disk(self):
+        """Tests that entries are memory-mapped from disk."""
+        points = np.array([(1, 2), (1.25, 2)])
+        jobcache.JobCache(self.directory).put('key', points, [0, 1])
+        cache = jobcache.JobCache(self.directory, disk_capacity=1)
+        cached_points, runs = cache.get('key')
+        self.assertIsInstance(cached_points, np.memmap)
+        self.assertEqual(cached_points.tolist(), points.tolist())
+        self.assertEqual(runs.tolist(), [0, 1])
+
+        cache.put('other', points, [0])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['other.points.npy', 'other.runs.npy'])
+
+    def test_key(self):
+        """Tests that keys depend on image content and parameters."""
+        image = os.path.join(self.directory, 'image.png')
+        with open(image, 'wb') as img_file:
+            img_file.write(b'image')
+        key = jobcache.image_key(image, (0, 0, 10, 10), 5, False)
+        self.assertEqual(key, jobcache.image_key(image, (0, 0, 10, 10), 5,
+                                                 False))
+        self.assertNotEqual(key, jobcache.image_key(image, (0, 0, 10, 10), 5,
+                                                    True))
+        with open(image, 'wb') as img_file:
+            img_file.write(b'other image')
+        self.assertNotEqual(key, jobcache.image_key(image, (0, 0, 10, 10), 5,
+                                                    False))
+
+    def test_compile_picture(self):
+        """Tests that a cached picture compiles to the same job."""
+        marker = BaseMarker(job_cache=jobcache.JobCache(self.directory))
+        job = marker.compile_picture('Logo_quadratisch.png', (0, 0, 20, 20),
+                                     max_run=8)
+        marker = BaseMarker(job_cache=jobcache.JobCache(self.directory))
+        marker.move_abs(1, 1)
+        cached = marker.compile_picture('Logo_quadratisch.png',
+                                        (0, 0, 20, 20), max_run=8)
+        self.assertEqual(marker.job_cache.hits, 1)
+        self.assertEqual(cached.points.tolist(), job.points.tolist())
+        self.assertEqual(cached.runs.tolist(), job.runs.tolist())
+        self.assertEqual(cached.start, (1, 1))
+
+    def test_home_order(self):
+        """Tests that cached jobs don't depend on the head position, like
+        the jobs compiled by the dispatcher."""
+        marker = BaseMarker(job_cache=jobcache.JobCache())
+        marker.move_abs(50, 50)
+        job = marker.compile_picture('Logo_quadratisch.png', (0, 0, 20, 20),
+                                     granularity=2)
+        self.assertEqual(job.points.tolist(), compile_picture(
+            'Logo_quadratisch.png', (0, 0, 20, 20), 2).points.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
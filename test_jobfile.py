@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import jobfile
+from job import Job, STROKE_CHUNK
+from marker import BaseMarker
+
+
+class JobFileTest(unittest.TestCase):
+    """Performs job file tests."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.job')
+        self.job = Job([(1, 1), (1, 1.2), (1, 1.4), (5.55, 3)], max_run=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """Tests that a written job is read back unchanged."""
+        jobfile.write(self.path, self.job, 122.5, 102.5, slow_motion=True)
+        job_file = jobfile.JobFile(self.path)
+        self.assertEqual((job_file.max_x, job_file.max_y), (122.5, 102.5))
+        self.assertTrue(job_file.slow_motion)
+        job = job_file.job(start=(1, 0))
+        self.assertEqual(job.points.tolist(), self.job.points.tolist())
+        self.assertEqual(job.runs.tolist(), [0, 3])
+        self.assertEqual(job.start, (1, 0))
+        self.assertEqual(os.path.getsize(self.path),
+                         jobfile.HEADER.size + 4 * jobfile.RECORD.itemsize)
+
+    def test_memory_mapped(self):
+        """Tests that a job is encoded from the records in chunks."""
+        job = Job([(x / 5.0, y / 5.0) for y in range(50)
+                   for x in range(100)])
+        self.assertGreater(len(job.runs), STROKE_CHUNK)
+        jobfile.write(self.path, job, 122.5, 102.5)
+        job_file = jobfile.JobFile(self.path)
+        loaded = job_file.job()
+        self.assertTrue(np.shares_memory(loaded.positions,
+                                         job_file.records))
+        self.assertEqual(loaded.pending(), job.pending())
+        self.assertEqual(loaded.remaining(STROKE_CHUNK + 1, (5, 5)).pending(),
+                         job.remaining(STROKE_CHUNK + 1, (5, 5)).pending())
+
+    def test_corrupt(self):
+        """Tests that changed records are detected."""
+        jobfile.write(self.path, self.job, 122.5, 102.5)
+        with open(self.path, 'r+b') as job_file:
+            job_file.seek(-3, os.SEEK_END)
+            job_file.write(b'\x01')
+        with self.assertRaises(Exception):
+            jobfile.JobFile(self.path)
+
+    def test_marker(self):
+        """Tests saving and loading jobs with the machine limits."""
+        marker = BaseMarker()
+        marker.save_job(self.path, self.job)
+        marker.move_abs(2, 2)
+        job = marker.load_job(self.path)
+        self.assertEqual(job.start, (2, 2))
+        self.assertEqual(len(job), 4)
+
+        jobfile.write(self.path, self.job, 200, 200)
+        with self.assertRaises(Exception):
+            marker.load_job(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+import layout
+import planner
+import raster
+from emulated import connect, wait_answered
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+
+LOGO = 'Logo_quadratisch.png'
+# four logos in a row and two below, the last box given by other corners
+BOXES = [(10, 10, 20, 20), (20, 10, 30, 20), (30, 10, 40, 20),
+         (40, 10, 50, 20), (10, 25, 25, 40), (40, 40, 25, 25)]
+
+
+class LayoutTest(unittest.TestCase):
+    """Performs bounding box layout tests."""
+    def test_overlaps(self):
+        """Tests that only boxes sharing an area overlap."""
+        self.assertEqual(layout.overlaps(BOXES), [])
+        self.assertEqual(layout.overlaps(BOXES + [(24, 19, 26, 26)]),
+                         [(1, 6), (4, 6), (5, 6)])
+        # a box inside another one
+        self.assertEqual(layout.overlaps([(0, 0, 10, 10), (2, 2, 3, 3)]),
+                         [(0, 1)])
+        self.assertEqual(layout.overlaps([]), [])
+
+    def test_check(self):
+        """Tests the errors of a layout."""
+        layout.check(BOXES, 100, 100)
+        with self.assertRaises(Exception):
+            layout.check(BOXES + [(15, 15, 16, 16)], 100, 100)
+        with self.assertRaises(Exception):
+            layout.check(BOXES, 45, 100)
+        with self.assertRaises(Exception):
+            layout.check([(-1, 0, 5, 5)], 100, 100)
+
+
+class MarkBatchTest(unittest.TestCase):
+    """Performs batch marking tests on the emulator."""
+    def setUp(self):
+        self.emulator, self.marker = connect(self)
+
+    def test_mark_batch(self):
+        """Tests that all images are marked with one ordered path."""
+        items = [(LOGO, box) for box in BOXES]
+        with Image.open(LOGO) as img:
+            points = [raster.rasterize(img, layout.as_boxes([box])[0], 2)
+                      for box in BOXES]
+
+        job = self.marker.compile_batch(items, granularity=2)
+        self.assertEqual(len(job), sum(len(p) for p in points))
+        # the images one after the other
+        start, separate = (0, 0), 0
+        for image_points in points:
+            ordered = planner.order_points(image_points, '2opt', start)
+            separate += planner.travel_length(ordered, start)
+            start = tuple(ordered[-1])
+        self.assertLess(planner.travel_length(job.points, (0, 0)), separate)
+
+        self.marker.mark_batch(items, granularity=2)
+        self.assertTrue(wait_answered(self.marker, 60))
+        self.assertEqual(sorted(map(tuple, self.emulator.strikes)),
+                         sorted(map(tuple, np.concatenate(points).tolist())))
+
+        with self.assertRaises(Exception):
+            self.marker.mark_batch(items + [(LOGO, (12, 12, 14, 14))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,13 @@
 #!/usr/bin/env python3.5
 # -*- coding: utf-8 -*-
 
-import re
 import unittest
-from marker import Marker
+from emulated import connect, emulated, wait_answered
+from job import Job
+from marker import BaseMarker
 import time
 import os
 from datetime import datetime
-import signal
-import subprocess as sp
-import serial
-import threading
 import random
 import logging
 try:
@@ -20,112 +17,6 @@ except ImportError:
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
 
-# send commands
-HEARTBEAT_OUT = 'RSIX800O00'
-ACK = 'ST 00 XX 00 60 00 00 00 00 00 00 00 00 00'
-
-# receive commands
-INIT = r'\*SQ;;\*SQ;;\*SQ;\*CB;\*INITstn;\*INITzn;\*DB;\*CPa;\*SE;' \
-        r'\*CPz;\*CPd;\*CPa;\*SE;\*INITp301;\*OI;;\*CPa;\*RTEOF;\*SE;' \
-        r'\*INITwn;\*INITgn;\*INITppn,pj;\*INITzpj;\*INITzn;\*INITd16,0,5,' \
-        r'500,20000;\*INITdx15,0,30;\*WD10;\*WU10;\*SE;\*INITs100.00,100.00;' \
-        r'\*INITo-100,-100;;\*INITno0,0;\*INITrd\+,\+;\*INITrr\+,\+;' \
-        r'\*INITrs\+,\+;LO1;\*LBn;\*INITesn,n;\*INITze-,-;\*VM6500,6500;' \
-        r'\*VN\d+,\d+;\*VS400,400;\*SE;\*VB\d+;\*VH600,600;\*VP600,600;' \
-        r'\*VC600,600;\*SE;;\*AC90000,90000;\*LBd0.00;\*LBm1.4,1.16;;' \
-        r'\*INITn1;;\*INITxqrap;;\*INITxp5;\*INITzs0;;\*INITaen,asn,adj;' \
-        r'\*MO18E1,9600;\*CPa;\*SE;;\*INITbeL,0,beL,1,beL,2,beH,3,beL,4,beH,' \
-        r'5,beH,6,beL,7,beL,8,beL,9,beL,10,beL,11,beL,12,beL,13,beL,14,beL,' \
-        r'15,beL,16,beL,17,beL,18,beL,19,beL,20,beL,21,beL,22,beL,23,beL,24;' \
-        r'\*INITbaD,22,baD,21,baD,20,baD,19,baD,18,baD,17,baD,16,baD,15,baD,' \
-        r'14,baD,13,baD,12,baD,11,baD,10,baD,9,baD,8,baD,7,baD,6,baD,5,baD,' \
-        r'4,baD,3,baD,2,baD,1,ba0,0;\*SE;;;;\*VP1200,1200;;\*CPa;\*RTEOF;' \
-        r'\*SE;CS6;\*INITbe0,5;;\*CPa;\*RTEOF;\*SE;;\*XRH;;\*EB;\*SE;;' \
-        r'\*SH;;\*SH;;\*SH;;\*SH;;PU;;\*INITrr\+,\+;'
-HOME = r';\*INITrd\+,\+;\*RX;\*RY;\*RTHOME;\*SH;;\*SE;;\*OA;;\*SH;;\*SE;'
-MOVE = r';\*PR\d+\.\d\d,\d+\.\d\d;;\*SH;\*OA;\*SE;'
-EMERGENCY_OFF = r';;\*HE;;;'
-NEEDLE = r'SP1;;PD;\*WT250;PU;\*SE;'
-HEARTBEAT_IN = r';\*SH;'
-
-
-class MarkerEmulator(threading.Thread):
-    """Emulates a Borries marker machine."""
-    read_buf = ''
-    initialized = False
-    daemon = True
-    running = True
-
-    def __init__(self, dev):
-        """Initializes emulator."""
-        threading.Thread.__init__(self)
-        self.serial = serial.Serial(dev, timeout=0)
-        self.answer_count = 0
-
-    def answer(self):
-        """Answer commands."""
-        answer_count_before = self.answer_count
-        if re.search(INIT, self.read_buf):
-            self.__command_seen(INIT)
-            self.initialized = True
-            self.write(ACK, 24)
-            self.answer_count += 1
-
-        if self.initialized:
-            if re.search(HOME, self.read_buf):
-                self.__command_seen(HOME)
-                self.write(ACK, 4)
-                self.answer_count += 1
-
-            if re.search(MOVE, self.read_buf):
-                self.__command_seen(MOVE)
-                self.write(ACK, 2)
-                self.answer_count += 1
-
-            if re.search(NEEDLE, self.read_buf):
-                self.__command_seen(NEEDLE)
-                self.write(ACK, 2)
-                self.answer_count += 1
-
-            if re.search(EMERGENCY_OFF, self.read_buf):
-                self.__command_seen(EMERGENCY_OFF)
-                self.initialized = False
-                logging.debug("EMU: found EMERGENCY")
-
-            if re.search(HEARTBEAT_IN, self.read_buf):
-                self.write(HEARTBEAT_OUT)
-                self.answer_count += 1
-
-        if self.answer_count != answer_count_before:
-            return True
-
-        return False
-
-    def read(self, size=128):
-        """Reads given amount of bytes in buffer."""
-        self.read_buf += str(self.serial.read(size), encoding='UTF-8')
-
-    def write(self, cmd, count=1):
-        """Writes given command count times to serial device."""
-        for i in range(count):
-            l = self.serial.write(('%s\r' % cmd).encode())
-            logging.debug("EMU: %d written" % l)
-
-    def __command_seen(self, cmd):
-        """Remove command from read buffer."""
-        self.read_buf = re.sub(cmd, '', self.read_buf, count=1)
-
-    def run(self):
-        while self.running:
-            logging.debug("EMU: read buf len: %d; answers: %d; %s" % (len(self.read_buf), self.answer_count, self.read_buf))
-            self.read()
-            while self.answer():
-                logging.debug("answered")
-                pass
-            time.sleep(.1)
-        logging.debug("GOOOOOOOOOODBYE")
-        quit()
-
 
 class MarkerTest(object):
     """Implements methods necessary for unit tests."""
@@ -134,40 +25,13 @@ class MarkerTest(object):
         super(MarkerTest, self).__init__(*args, **kwargs)
 
     def setUp(self):
-        """Prepare PTYs, MarkerEmulator and Marker."""
+        """Prepare emulator on a virtual clock and Marker."""
         logging.debug("setting up..")
-        self.running = True
-        """
-        # create two connected PTYs
-        cmd = ['socat', '-d', '-d', 'pty,raw,echo=0', 'pty,raw,echo=0']
-        try:
-            self.socat = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.STDOUT)
-            with self.socat.stdout as stdout:
-                marker_pty = stdout.readline().split()[-1]
-                if not os.path.exists(marker_pty):
-                    raise Exception('PTY creation failed.')
-
-                client_pty = stdout.readline().split()[-1]
-        except OSError:
-            raise Exception('%s is not installed' % cmd[0])
-        """
-        marker_pty = b'/dev/pts/3'
-        client_pty = b'/dev/pts/4'
+        self.marker_emu, self.marker_client = connect(self)
 
-        self.marker_emu = MarkerEmulator(str(marker_pty, encoding='UTF-8'))
-        self.marker_emu.start()
-
-        self.marker_client = Marker(str(client_pty, encoding='UTF-8'))
-        self.marker_client.start()
-
-    def tearDown(self):
-        """Clean up and shut down."""
-        logging.debug("tearing down..")
-        self.marker_client.running = False
-        del self.marker_client
-        self.marker_emu.running = False
-        del self.marker_emu
-        #os.kill(self.socat.pid, signal.SIGINT)
+    def wait_executed(self, timeout=10):
+        """Waits until all commands that got sent were answered."""
+        wait_answered(self.marker_client, timeout)
 
     def check_commands_executed(self):
         """Checks if all commands that got sent were executed."""
@@ -178,7 +42,7 @@ class MarkerTest(object):
         """Move test wrapper."""
         done_before = self.marker_client.count['ST'].done
         move_method(*args, **kwargs)
-        time.sleep(1)
+        self.wait_executed()
         # independent movement check
         self.assertEqual(self.marker_client.count['ST'].done, done_before + 1)
 
@@ -225,7 +89,7 @@ class MarkerBasicTest(MarkerTest, unittest.TestCase):
         """Tests needle down functionality."""
         done_before = self.marker_client.count['ST'].done
         self.marker_client.needle_down()
-        time.sleep(1)
+        self.wait_executed()
         self.check_commands_executed()
         self.assertEqual(self.marker_client.count['ST'].done, done_before + 1)
         self.check_commands_executed()
@@ -234,7 +98,7 @@ class MarkerBasicTest(MarkerTest, unittest.TestCase):
         """Tests movement to home position."""
         self.marker_client.home()
         x, y = self.marker_client.position()
-        time.sleep(1)
+        self.wait_executed()
         self.assertEqual(x, 0)
         self.assertEqual(y, 0)
         self.check_commands_executed()
@@ -243,13 +107,13 @@ class MarkerBasicTest(MarkerTest, unittest.TestCase):
         """Tests marker limit."""
         with self.assertRaises(Exception):
             self.marker_client.move_abs(1000, 1000)
-            time.sleep(1)
+            self.wait_executed()
 
     def _test_emergency_exit(self):
         """Tests emergency exit function."""
         self.marker_client.move_abs(100, 100)
         with self.assertRaises(Exception):
-            time.sleep(1)
+            self.wait_executed()
             self.marker_client.emergency_off()
 
 
@@ -283,8 +147,84 @@ class MarkerImageTest(MarkerTest, unittest.TestCase):
                 extrema_diff = [col[0] != col[1] for col in img.getextrema()]
                 self.assertTrue(any(extrema_diff))
         """
-        time.sleep(300)
+        self.wait_executed(60)
         self.check_commands_executed()
+        self.assertEqual(len(self.marker_emu.strikes), 4871)
+
+        snapshot = self.marker_client.metrics.snapshot()
+        count = self.marker_client.count['ST']
+        self.assertEqual(snapshot['answers']['ST'], 2 * count.tbd)
+        self.assertEqual(snapshot['gauges']['in_flight'], 0)
+        self.assertEqual(snapshot['gauges']['st_done'], count.tbd)
+        self.assertGreater(snapshot['counters']['bytes_in'],
+                           snapshot['answers']['ST'])
+        # heartbeats may be pulled but not written yet
+        self.assertLessEqual(snapshot['counters']['bytes_out'],
+                             self.marker_client.queue.stats()['bytes_out'])
+        self.assertGreater(
+            snapshot['histograms']['round_trip_seconds']['count'], 0)
+        # the queue's lock is taken by mark_picture and the sender
+        self.assertGreater(
+            snapshot['histograms']['lock_wait_seconds']['count'], 0)
+        self.assertGreater(snapshot['answer_rates']['ST'], 0)
+
+
+class RecordingMarker(BaseMarker):
+    """BaseMarker keeping the queued jobs and when they were queued."""
+    def __init__(self):
+        BaseMarker.__init__(self)
+        self.jobs = []
+
+    def _send_job(self, job):
+        self.jobs.append((time.time(), job))
+        return BaseMarker._send_job(self, job)
+
+
+class MarkerTiledTest(unittest.TestCase):
+    """Performs tests of pictures ordered while they are queued."""
+    def test_tiles(self):
+        """Tests that the first tile is queued before the last is
+        ordered."""
+        marker = RecordingMarker()
+        marker.stream_tile_points = 500
+        box = (0, 0, 30, 30)
+        start = time.time()
+        marker.mark_picture('Logo_quadratisch.png', box)
+        self.assertGreater(len(marker.jobs), 4)
+        self.assertLess(marker.jobs[0][0] - start,
+                        (marker.jobs[-1][0] - start) / 2)
+        points = marker.load_picture('Logo_quadratisch.png', box)
+        self.assertEqual(sorted(map(tuple, marker.pending_points().tolist())),
+                         sorted(map(tuple, points.tolist())))
+
+        marker = RecordingMarker()
+        with self.assertRaises(Exception):
+            marker.mark_picture('Logo_quadratisch.png', (100, 0, 130, 30))
+        self.assertEqual(marker.jobs, [])
+
+
+class MarkerBatchTest(unittest.TestCase):
+    """Performs datagram batching tests."""
+    def mark(self, batch_bytes):
+        """Marks a job on a fresh emulator, returns strikes, simulated time
+        and queue stats."""
+        with emulated(batch_bytes=batch_bytes) as (emulator, marker):
+            marker.move_abs(10, 10)
+            marker.needle_down()
+            marker.mark_job(Job([(x / 2.0, y / 2.0) for x in range(20, 60)
+                                 for y in range(20, 60, 7)], max_run=3))
+            marker.home()
+            self.assertTrue(wait_answered(marker, 20))
+            return emulator.strikes, emulator.clock, marker.queue.stats()
+
+    def test_batch(self):
+        """Tests that batched writes keep the commands' effect."""
+        strikes, clock, stats = self.mark(None)
+        for batch_bytes in (64, 512):
+            batch_strikes, batch_clock, batch_stats = self.mark(batch_bytes)
+            self.assertEqual(batch_strikes, strikes)
+            self.assertAlmostEqual(batch_clock, clock, 6)
+            self.assertLess(batch_stats['writes'], stats['writes'])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from metrics import Histogram, Metrics
+
+
+class HistogramTest(unittest.TestCase):
+    """Performs histogram tests."""
+    def test_buckets(self):
+        """Tests cumulative bucket counts."""
+        histogram = Histogram((1, 2, 5))
+        for value in (.5, 1, 1.5, 3, 10):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(list(snapshot['buckets'].values()), [2, 3, 4, 5])
+        self.assertEqual(snapshot['count'], 5)
+        self.assertEqual(snapshot['sum'], 16)
+
+
+class MetricsTest(unittest.TestCase):
+    """Performs metrics tests."""
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_round_trip(self):
+        """Tests that datagrams are done with their last answer."""
+        self.metrics.sent(10, 2)
+        self.metrics.sent(10)
+        self.metrics.sent(10, 3)
+        for done in (.5, 1, 1.5, 2):
+            self.metrics.answered('ST', done)
+        histogram = self.metrics.histograms['round_trip_seconds']
+        self.assertEqual(histogram.count, 1)
+        self.metrics.answered('ST', 3)
+        self.assertEqual(histogram.count, 2)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['counters']['bytes_out'], 30)
+        self.assertEqual(snapshot['counters']['writes'], 3)
+        self.assertEqual(snapshot['answers'], {'ST': 5})
+        self.assertGreater(snapshot['answer_rates']['ST'], 0)
+
+    def test_timed_lock(self):
+        """Tests lock wait and hold times."""
+        lock = self.metrics.timed_lock(threading.RLock())
+        with lock:
+            with lock:
+                pass
+        self.assertEqual(self.metrics.histograms['lock_wait_seconds'].count,
+                         2)
+        self.assertEqual(self.metrics.histograms['lock_hold_seconds'].count,
+                         2)
+
+    def test_condition(self):
+        """Tests waiting on a condition with a timed lock and the time
+        another thread waits for it."""
+        cond = threading.Condition(self.metrics.timed_lock(threading.RLock()))
+        items = []
+
+        def consume():
+            with cond:
+                while not items:
+                    cond.wait()
+                items.pop()
+
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        time.sleep(.05)
+        with cond:
+            with cond:
+                items.append(1)
+                cond.notify()
+            # the consumer waits for the lock now
+            time.sleep(.05)
+        consumer.join()
+        self.assertEqual(items, [])
+        wait = self.metrics.histograms['lock_wait_seconds']
+        hold = self.metrics.histograms['lock_hold_seconds']
+        self.assertGreaterEqual(wait.sum, .04)
+        self.assertGreaterEqual(hold.sum, .05)
+        # consumer, producer and its nested acquire, consumer after wait
+        self.assertEqual(wait.count, 4)
+        self.assertEqual(hold.count, 4)
+
+    def test_prometheus(self):
+        """Tests the Prometheus text file."""
+        self.metrics.gauge('queue_depth', lambda: 7)
+        self.metrics.received(42)
+        self.metrics.histograms['read_seconds'].observe(.002)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'marker.prom')
+            self.metrics.write_prometheus(path)
+            with open(path) as prom_file:
+                lines = prom_file.read().splitlines()
+            self.assertEqual(os.listdir(directory), ['marker.prom'])
+        self.assertIn('marker_bytes_in_total 42', lines)
+        self.assertIn('marker_queue_depth 7', lines)
+        self.assertIn('marker_read_seconds_bucket{le="0.001"} 0', lines)
+        self.assertIn('marker_read_seconds_bucket{le="0.005"} 1', lines)
+        self.assertIn('marker_read_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('marker_read_seconds_count 1', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
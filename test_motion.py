@@ -0,0 +1,84 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+from job import Job
+from motion import MotionModel, SpeedProfile
+from protocol import INIT
+
+
+class MotionModelTest(unittest.TestCase):
+    """Performs motion model tests."""
+    def test_init(self):
+        """Tests that INIT parameters are taken over."""
+        model = MotionModel.from_init(INIT % (650, 650, 220))
+        self.assertEqual((model.speed, model.start_speed, model.acceleration),
+                         (650, 400, 90000))
+        self.assertEqual(model.steps_per_mm, 100)
+        self.assertEqual(MotionModel.from_init(INIT % (6500, 6500, 2200))
+                         .speed, 6500)
+        # the limit of speed changes is the same in slow motion
+        self.assertEqual(model.max_speed, 6500)
+
+    def test_axis_time(self):
+        """Tests trapezoidal and triangular speed profiles."""
+        model = MotionModel()
+        # 6500 steps/s after (6500² - 400²) / 180000 = 233.8 steps
+        self.assertAlmostEqual(model.axis_time(100),
+                               2 * 6100 / 90000.0 +
+                               (10000 - 2 * 233.8) / 6500.0, 3)
+        # 1 mm never reaches top speed
+        self.assertAlmostEqual(model.axis_time(1),
+                               2 * ((400 ** 2 + 90000 * 100) ** .5 - 400) /
+                               90000.0)
+        self.assertEqual(model.axis_time(0), 0)
+        self.assertEqual(model.move_time(-1, 100), model.axis_time(100))
+
+    def test_slow_motion(self):
+        """Tests that slow motion moves take longer."""
+        slow = MotionModel.from_init(INIT % (650, 650, 220))
+        self.assertGreater(slow.move_time(50, 0), 5 *
+                           MotionModel().move_time(50, 0))
+
+
+class SpeedProfileTest(unittest.TestCase):
+    """Performs speed profile tests."""
+    def test_speeds(self):
+        """Tests move classes and the safety envelope."""
+        profile = SpeedProfile(((0, 2200), (5, 6500)), margin=1)
+        job = Job([(2, 2), (2.2, 2), (40, 30), (40, 30.2), (99.8, 50)])
+        self.assertEqual(profile.speeds(job, 6500, 100, 100).tolist(),
+                         [2200, 2200, 6500, 2200, 2200])
+        # never faster than the limit
+        self.assertEqual(profile.speeds(job, 650, 100, 100).tolist(),
+                         [650] * 5)
+        # near the edges of a smaller plate
+        self.assertEqual(profile.speeds(job, 6500, 40.5, 100).tolist(),
+                         [2200] * 5)
+
+    def test_slow_motion(self):
+        """Tests that long jumps are faster than slow motion."""
+        model = MotionModel.from_init(INIT % (650, 650, 220))
+        profile = SpeedProfile()
+        job = Job([(x, 10) for x in (10, 10.2, 60, 60.2)])
+        speeds = profile.speeds(job, model.max_speed, 100, 100)
+        self.assertEqual(speeds.tolist(), [6500, 2200, 6500, 2200])
+        self.assertGreater(profile.time_saved(model, job, speeds,
+                                              model.speed), 0)
+
+    def test_time_saved(self):
+        """Tests the time saved over a constant speed."""
+        model = MotionModel()
+        profile = SpeedProfile()
+        job = Job([(x, 10) for x in (10, 13, 16, 60, 63, 66, 69, 72)])
+        speeds = profile.speeds(job, 6500, 100, 100)
+        self.assertGreater(profile.time_saved(model, job, speeds, 2200), 0)
+        self.assertLess(profile.time_saved(model, job, speeds, 6500), 0)
+        self.assertAlmostEqual(profile.time_saved(model, job, speeds, 2200) -
+                               profile.time_saved(model, job, speeds, 6500),
+                               model.job_times(job, [2200] * 8).sum() -
+                               model.job_times(job).sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
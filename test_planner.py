@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+import concurrent.futures
+import random
+import time
+import planner
+
+
+class PlannerTest(unittest.TestCase):
+    """Performs path planning tests."""
+    def setUp(self):
+        """Prepare a raster of needle points with two separate shapes."""
+        random.seed(42)
+        self.points = [(x / 5.0, y / 5.0) for x in range(60)
+                       for y in range(60)
+                       if (x - 20) ** 2 + (y - 20) ** 2 < 150 or
+                       (x > 45 and y > 40 and random.random() < .7)]
+
+    def assertPermutation(self, ordered):
+        """Checks that ordering neither dropped nor duplicated points."""
+        self.assertEqual(sorted(map(tuple, ordered.tolist())),
+                         sorted(self.points))
+
+    def test_travel_length(self):
+        """Tests travel length calculation."""
+        self.assertEqual(planner.travel_length([]), 0)
+        self.assertAlmostEqual(planner.travel_length([(3, 4), (3, 0)]), 9)
+        self.assertAlmostEqual(planner.travel_length([(3, 4)], (3, 3)), 1)
+
+    def test_orders(self):
+        """Tests that each order keeps all points and shortens travel."""
+        raster = planner.travel_length(self.points)
+        lengths = []
+        for method in planner.ORDERS:
+            ordered = planner.order_points(self.points, method)
+            self.assertPermutation(ordered)
+            lengths.append(planner.travel_length(ordered))
+        self.assertAlmostEqual(lengths[0], raster)
+        self.assertLess(lengths[1], raster)
+        self.assertLess(lengths[2], raster)
+        self.assertLessEqual(lengths[3], lengths[2])
+
+    def test_serpentine(self):
+        """Tests that serpentine order alternates the column direction."""
+        ordered = planner.serpentine([(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertEqual(ordered.tolist(),
+                         [[0, 0], [0, 1], [1, 1], [1, 0]])
+
+    def test_sparse_points(self):
+        """Tests nearest neighbour lookups far outside the grid rings."""
+        points = [(0, 0), (0.1, 0), (100, 100), (0.2, 0)]
+        ordered = planner.nearest_neighbour(points, cell_size=.1)
+        self.assertEqual(ordered[-1].tolist(), [100, 100])
+
+    def test_collinear(self):
+        """Tests that points in one column are ordered as fast as spread
+        out ones."""
+        points = [(10, y / 5.0) for y in range(20000)]
+        random.shuffle(points)
+        start = time.time()
+        ordered = planner.nearest_neighbour(points)
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(ordered.tolist(),
+                         [[10, y / 5.0] for y in range(20000)])
+
+    def test_tile_grid(self):
+        """Tests that tiles are visited like serpentine."""
+        points = [(0, 0), (0, 9), (9, 0), (9, 9), (4, 4)]
+        cells = planner.tile_grid(points, tiles=2)
+        self.assertEqual([idx.tolist() for idx in cells],
+                         [[0, 4], [1], [3], [2]])
+
+    def test_order_tiled(self):
+        """Tests ordering tiles in worker processes."""
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            ordered = planner.order_tiled(self.points, executor=executor)
+        self.assertPermutation(ordered)
+        self.assertEqual(ordered.tolist(),
+                         planner.order_tiled(self.points).tolist())
+        self.assertLess(planner.travel_length(ordered),
+                        1.2 * planner.travel_length(
+                            planner.order_points(self.points)))
+
+    def test_same_points(self):
+        """Tests ordering points which all lie at the start."""
+        for order in planner.ORDERS:
+            ordered = planner.order_points([(1, 1)] * 4, order, (1, 1))
+            self.assertEqual(ordered.tolist(), [[1, 1]] * 4)
+
+    def test_unknown_order(self):
+        """Tests unknown order names."""
+        with self.assertRaises(ValueError):
+            planner.order_points(self.points, 'random')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+import unittest
+import numpy as np
+import preview
+from marker import BaseMarker
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+
+class PreviewTest(unittest.TestCase):
+    """Performs preview tests."""
+    def test_render(self):
+        """Tests that dots are stamped at their positions."""
+        img = preview.render([(1, 1), (2.5, 0.5)], (3, 2), resolution=10,
+                             radius=1, mode='L')
+        self.assertEqual(img.size, (30, 20))
+        canvas = np.asarray(img)
+        self.assertEqual(canvas[10, 10], 0)
+        self.assertEqual(canvas[10, 11], 0)
+        self.assertEqual(canvas[11, 11], 255)
+        self.assertEqual(canvas[5, 25], 0)
+        self.assertEqual((canvas == 0).sum(), 10)
+
+    def test_region(self):
+        """Tests rendering a tile of the plate."""
+        img = preview.render([(1, 1), (2.5, 0.5)], (3, 2), resolution=10,
+                             radius=0, mode='1', region=(2, 0, 3, 1))
+        self.assertEqual(img.size, (10, 10))
+        self.assertEqual(img.getpixel((5, 5)), 0)
+        self.assertEqual(np.asarray(img.convert('L')).min(axis=None), 0)
+
+    def test_pending_points(self):
+        """Tests that queued commands and jobs give their needle points."""
+        marker = BaseMarker()
+        marker.move_abs(1, 1)
+        marker.needle_down()
+        points = [(2, 2), (2, 2.1), (2, 2.2), (5.5, 3)]
+        marker.mark_points(points, order='raster', max_run=4)
+        marker.move_rel(1, 1)
+        marker.needle_down()
+        self.assertEqual(marker.pending_points().tolist(),
+                         [[1, 1]] + [list(p) for p in points] + [[6.5, 4]])
+
+    def test_emergency_off(self):
+        """Tests that commands out of bounds drop all queued commands."""
+        marker = BaseMarker()
+        marker.move_abs(1, 1)
+        with self.assertRaisesRegex(Exception, 'Emergency off'):
+            marker.move_rel(marker.MAX_X, 0)
+        self.assertEqual(len(marker.pending_points()), 0)
+        with self.assertRaisesRegex(Exception, 'Emergency off'):
+            marker.mark_points([(-1, 0)])
+
+    def test_whole_plate(self):
+        """Tests that a downsampled whole-plate preview is fast."""
+        marker = BaseMarker()
+        x, y = np.mgrid[0:120:.1, 0:100:.1]
+        marker.mark_points(np.column_stack((x.ravel(), y.ravel())),
+                           order='raster')
+        with tempfile.TemporaryDirectory() as tmp:
+            preview_file = os.path.join(tmp, 'preview.png')
+            start = time.time()
+            marker.preview(rds=0, preview_file=preview_file, resolution=10,
+                           mode='1')
+            self.assertLess(time.time() - start, 1)
+            with Image.open(preview_file) as img:
+                self.assertEqual(img.size, (1225, 1025))
+
+    def test_default_size(self):
+        """Tests that a job of few dots renders fast at the defaults of
+        Marker.preview."""
+        points = np.random.RandomState(0).uniform(0, 100, (5000, 2))
+        start = time.time()
+        img = preview.render(points, (BaseMarker.MAX_X, BaseMarker.MAX_Y))
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(img.size, (12250, 10250))
+        self.assertEqual(img.getpixel(tuple(np.rint(points[0] * 100))),
+                         (0, 0, 0))
+
+    def test_dense(self):
+        """Tests that dense dots are stamped like few dots."""
+        points = np.random.RandomState(0).uniform(-.05, 3.05, (40, 2))
+        few = np.asarray(preview.render(points, (3, 3), radius=7.5,
+                                        mode='L'))
+        dense = np.asarray(preview.render(np.repeat(points, 200, axis=0),
+                                          (3, 3), radius=7.5, mode='L'))
+        self.assertEqual(few.tolist(), dense.tolist())
+        self.assertGreater((few == 0).sum(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
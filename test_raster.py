@@ -0,0 +1,52 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import unittest
+import raster
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+
+class RasterTest(unittest.TestCase):
+    """Performs rasterization tests."""
+    def pixel_loop(self, img, bounding_box, granularity):
+        """Needle points the way the per pixel loop used to find them."""
+        img = img.resize(raster.raster_size(bounding_box, granularity),
+                         Image.LANCZOS).convert('1')
+        return [(bounding_box[0] + x / float(granularity),
+                 bounding_box[1] + y / float(granularity))
+                for x in range(img.size[0]) for y in range(img.size[1])
+                if img.getpixel((x, y)) == 0]
+
+    def test_logo(self):
+        """Tests that rasterization matches the per pixel loop."""
+        bounding_box = (10, 20, 40, 50)
+        with Image.open('Logo_quadratisch.png') as img:
+            points = raster.rasterize(img, bounding_box, granularity=2)
+            self.assertEqual(points.shape[1], 2)
+            self.assertGreater(len(points), 0)
+            self.assertEqual([tuple(p) for p in points.tolist()],
+                             self.pixel_loop(img, bounding_box, 2))
+
+    def test_threshold(self):
+        """Tests fixed threshold without dithering."""
+        img = Image.new('L', (4, 2), 255)
+        img.putpixel((1, 0), 100)
+        img.putpixel((3, 1), 200)
+        points = raster.rasterize(img, (0, 0, 2, 1), granularity=2,
+                                  dither=False, threshold=128)
+        self.assertEqual(points.tolist(), [[.5, 0]])
+        points = raster.rasterize(img, (0, 0, 2, 1), granularity=2,
+                                  dither=False, threshold=201)
+        self.assertEqual(points.tolist(), [[.5, 0], [1.5, .5]])
+
+    def test_empty(self):
+        """Tests white images."""
+        img = Image.new('L', (10, 10), 255)
+        self.assertEqual(raster.rasterize(img, (0, 0, 5, 5)).shape, (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
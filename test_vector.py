@@ -0,0 +1,86 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import vector
+from emulated import emulated, wait_answered
+
+SVG = '''<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="200mm" height="100mm"
+     viewBox="0 0 200 100">
+  <g>
+    <rect x="10" y="10" width="40" height="20"/>
+    <path d="M 100 50 c 20 0 40 20 40 40"/>
+    <line x1="190" y1="90" x2="150" y2="10"/>
+  </g>
+</svg>
+'''
+
+
+class VectorTest(unittest.TestCase):
+    """Performs vector input tests."""
+    def test_sample(self):
+        """Tests that dots are evenly spaced at most pitch apart."""
+        dots = vector.sample([(0, 0), (1, 0), (1, 1)], .3)
+        steps = np.hypot(*np.diff(dots, axis=0).T)
+        self.assertEqual(len(dots), 8)
+        self.assertTrue(np.allclose(steps[:3], 2 / 7.0))
+        self.assertTrue((steps <= .3 + 1e-9).all())
+        self.assertEqual(tuple(dots[0]), (0, 0))
+        self.assertEqual(tuple(dots[-1]), (1, 1))
+        self.assertEqual(len(vector.sample([(2, 2), (2, 2)], .3)), 1)
+
+    def test_path(self):
+        """Tests absolute and relative path commands."""
+        polylines = vector.parse_path('M0,0 L10 0 h5 v5 z m1 1 2 0 '
+                                      'Q3 1 3 3')
+        self.assertEqual(len(polylines), 2)
+        self.assertEqual(polylines[0].tolist(),
+                         [[0, 0], [10, 0], [15, 0], [15, 5], [0, 0]])
+        self.assertEqual(polylines[1][:2].tolist(), [[1, 1], [3, 1]])
+        self.assertEqual(len(polylines[1]), 2 + vector.CURVE_SEGMENTS)
+        self.assertTrue(np.allclose(polylines[1][-1], (3, 3)))
+        with self.assertRaises(Exception):
+            vector.parse_path('M0 0 A 1 1 0 0 0 2 2')
+        # closepath takes no numbers
+        with self.assertRaises(Exception):
+            vector.parse_path('M0 0 L1 1 Z 5 5')
+
+    def test_order(self):
+        """Tests that lines are ordered and reversed to shorten travel."""
+        polylines = [np.array([(10, 0), (5, 0)]),
+                     np.array([(0, 1), (3, 1)])]
+        ordered = vector.order_strokes(polylines)
+        self.assertEqual([p.tolist() for p in ordered],
+                         [[[0, 1], [3, 1]], [[5, 0], [10, 0]]])
+        # the shared corner of joined lines is struck once
+        points = vector.stroke_points([[(0, 0), (1, 0)], [(1, 0), (1, 1)]],
+                                      .5)
+        self.assertEqual(len(points), 5)
+
+    def test_svg(self):
+        """Tests marking an SVG file on the emulator."""
+        with tempfile.TemporaryDirectory() as directory:
+            svg_file = os.path.join(directory, 'drawing.svg')
+            with open(svg_file, 'w') as f:
+                f.write(SVG)
+            polylines = vector.load_svg(svg_file, (10, 10, 110, 60))
+            self.assertEqual(len(polylines), 3)
+            self.assertEqual(polylines[0][:2].tolist(),
+                             [[15, 15], [35, 15]])
+            self.assertTrue(np.allclose(polylines[1][-1], (80, 55)))
+
+            with emulated() as (emulator, marker):
+                marker.mark_svg(svg_file, (10, 10, 110, 60), pitch=.5)
+                self.assertTrue(wait_answered(marker))
+                expected = vector.stroke_points(polylines, .5, (0, 0))
+                self.assertEqual(len(emulator.strikes), len(expected))
+                self.assertTrue(np.allclose(emulator.strikes,
+                                            np.rint(expected * 100) / 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+import window
+from emulated import emulated, wait_answered
+from emulator import Emulator
+from marker import Marker
+
+
+class RecordingMarker(Marker):
+    """Marker keeping the most commands in flight after a write."""
+    max_in_flight = 0
+
+    def _written(self, datagram):
+        Marker._written(self, datagram)
+        self.max_in_flight = max(self.max_in_flight, self.in_flight())
+
+
+class WindowTest(unittest.TestCase):
+    """Performs flow-control window tests on the emulator."""
+    def test_in_flight(self):
+        """Tests that a job never has more than window commands in flight."""
+        for size in (1, 3):
+            # strikes take real time, so answers lag behind the writes
+            with emulated(50, RecordingMarker, log_level=logging.WARNING,
+                          window=size) as (_, marker):
+                self.assertTrue(wait_answered(marker))
+                # init is sent at once, so the job is measured from here
+                marker.max_in_flight = 0
+                marker.mark_points([(1 + i % 5, 1 + i // 5)
+                                    for i in range(20)], order='raster')
+                self.assertTrue(wait_answered(marker))
+                self.assertEqual(marker.max_in_flight, size)
+
+    def test_measure_windows(self):
+        """Tests that every window is measured and one of them chosen."""
+        emulator = Emulator(speed=50)
+        emulator.start()
+        self.addCleanup(emulator.stop)
+        size, results = window.measure_windows(emulator.device,
+                                               windows=(1, 2, 4), moves=10)
+        self.assertEqual(sorted(results), [1, 2, 4])
+        self.assertIn(size, results)
+        self.assertTrue(all(rate > 0 for rate in results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import re
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import planner
+
+# path commands and their number of arguments
+PATH_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'Q': 4, 'Z': 0}
+PATH_TOKEN_RE = re.compile(r'([A-Za-z])|'
+                           r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+# line segments a Bezier curve is flattened into before sampling
+CURVE_SEGMENTS = 16
+
+
+def sample(polyline, pitch):
+    """Returns (N, 2) array of dots along a polyline, evenly spaced at most
+    pitch apart and including both ends."""
+    polyline = planner.as_points(polyline)
+    if len(polyline) < 2:
+        return polyline.copy()
+    lengths = np.hypot(*np.diff(polyline, axis=0).T)
+    distance = np.concatenate(([0], np.cumsum(lengths)))
+    if distance[-1] == 0:
+        return polyline[:1].copy()
+    count = int(np.ceil(distance[-1] / pitch - 1e-9)) + 1
+    at = np.linspace(0, distance[-1], count)
+    return np.column_stack((np.interp(at, distance, polyline[:, 0]),
+                            np.interp(at, distance, polyline[:, 1])))
+
+
+def order_strokes(polylines, start=(0, 0)):
+    """Returns the polylines in nearest neighbour order starting at start,
+    each one reversed if its end is closer than its start."""
+    remaining = [planner.as_points(p) for p in polylines if len(p)]
+    if not remaining:
+        return []
+    ends = np.array([(p[0], p[-1]) for p in remaining])
+    left = np.ones(len(remaining), dtype=bool)
+    position = np.asarray(start, dtype=float)
+    ordered = []
+    for _ in range(len(remaining)):
+        distance = np.hypot(*(ends - position).transpose(2, 0, 1))
+        distance[~left] = np.inf
+        i, end = np.unravel_index(np.argmin(distance), distance.shape)
+        left[i] = False
+        polyline = remaining[i][::-1] if end else remaining[i]
+        ordered.append(polyline)
+        position = polyline[-1]
+    return ordered
+
+
+def stroke_points(polylines, pitch=.2, start=None):
+    """Returns (N, 2) array of dots sampled at pitch along all polylines,
+    line by line. With start, the lines are ordered to shorten the travel
+    from there (see order_strokes). Dots repeated where lines join are
+    dropped."""
+    if start is not None:
+        polylines = order_strokes(polylines, start)
+    chunks = [sample(polyline, pitch) for polyline in polylines]
+    if not chunks:
+        return np.zeros((0, 2))
+    points = np.vstack(chunks)
+    # positions are sent in hundredths of a mm
+    rounded = np.rint(points * 100)
+    repeated = np.zeros(len(points), dtype=bool)
+    repeated[1:] = (rounded[1:] == rounded[:-1]).all(axis=1)
+    return points[~repeated]
+
+
+def _bezier(points, segments=CURVE_SEGMENTS):
+    """Returns a Bezier curve given by its control points as polyline,
+    without its first point."""
+    t = np.linspace(0, 1, segments + 1)[1:, np.newaxis]
+    points = [np.asarray(p, dtype=float) for p in points]
+    # de Casteljau
+    while len(points) > 1:
+        points = [(1 - t) * a + t * b for a, b in zip(points, points[1:])]
+    return [tuple(p) for p in points[0]]
+
+
+def parse_path(d):
+    """Returns the polylines of an SVG path's d attribute. Supported are
+    the commands M, L, H, V, C, Q and Z, absolute and relative; curves are
+    flattened into CURVE_SEGMENTS lines."""
+    tokens = PATH_TOKEN_RE.findall(d)
+    polylines = []
+    current = []
+    x = y = 0.0
+    start = (0.0, 0.0)
+    command = None
+    i = 0
+    while i < len(tokens):
+        letter, number = tokens[i]
+        if letter:
+            command = letter
+            i += 1
+        elif command is None:
+            raise Exception('Path data starts with a number: %s' % d)
+        upper = command.upper()
+        if upper not in PATH_ARGS:
+            raise Exception('Unsupported path command %s.' % command)
+        count = PATH_ARGS[upper]
+        if not letter and not count:
+            raise Exception('Unsupported arguments of path command %s.' %
+                            command)
+        args = [float(number) for _, number in tokens[i:i + count]]
+        if len(args) < count or any(letter for letter, _ in
+                                     tokens[i:i + count]):
+            raise Exception('Missing arguments of path command %s.' %
+                            command)
+        i += count
+        relative = command.islower()
+        if upper == 'Z':
+            if current:
+                current.append(start)
+                polylines.append(current)
+            current = []
+            x, y = start
+            continue
+        if upper == 'H':
+            args = [args[0] + (x if relative else 0), y]
+        elif upper == 'V':
+            args = [x, args[0] + (y if relative else 0)]
+        elif relative:
+            args = [v + (y if j % 2 else x) for j, v in enumerate(args)]
+        target = (args[-2], args[-1])
+        if upper == 'M':
+            if len(current) > 1:
+                polylines.append(current)
+            current = [target]
+            start = target
+            # further coordinate pairs are lines
+            command = 'l' if relative else 'L'
+        else:
+            if not current:
+                current = [(x, y)]
+            if upper in ('C', 'Q'):
+                controls = [(x, y)] + list(zip(args[::2], args[1::2]))
+                current.extend(_bezier(controls))
+            else:
+                current.append(target)
+        x, y = target
+    if len(current) > 1:
+        polylines.append(current)
+    return [planner.as_points(polyline) for polyline in polylines]
+
+
+def _numbers(text):
+    """Returns the numbers in an attribute value (e.g. points)."""
+    return [float(number) for _, number in PATH_TOKEN_RE.findall(text or '')
+            if number]
+
+
+def _length(value):
+    """Returns a length attribute without its unit, e.g. '50mm'."""
+    numbers = _numbers(value)
+    return numbers[0] if numbers else None
+
+
+def element_polylines(element):
+    """Returns the polylines of an SVG shape element. Transforms are not
+    supported."""
+    tag = element.tag.rsplit('}', 1)[-1]
+    get = element.get
+    if tag == 'path':
+        return parse_path(get('d', ''))
+    elif tag in ('polyline', 'polygon'):
+        points = planner.as_points(_numbers(get('points')))
+        if tag == 'polygon' and len(points):
+            points = np.vstack((points, points[:1]))
+        return [points] if len(points) else []
+    elif tag == 'line':
+        return [planner.as_points([float(get(name, 0)) for name in
+                                   ('x1', 'y1', 'x2', 'y2')])]
+    elif tag == 'rect':
+        x, y, width, height = (float(get(name, 0)) for name in
+                               ('x', 'y', 'width', 'height'))
+        return [planner.as_points([(x, y), (x + width, y),
+                                   (x + width, y + height), (x, y + height),
+                                   (x, y)])]
+    return []
+
+
+def load_svg(svg_file, bounding_box):
+    """Returns the polylines of all shapes in an SVG file in mm, with the
+    drawing stretched to the bounding box like mark_picture does with
+    images."""
+    root = ElementTree.parse(svg_file).getroot()
+    view_box = _numbers(root.get('viewBox'))
+    if len(view_box) == 4:
+        left, top, width, height = view_box
+    else:
+        left, top = 0, 0
+        width, height = _length(root.get('width')), \
+            _length(root.get('height'))
+        if not width or not height:
+            raise Exception('%s has neither viewBox nor size.' % svg_file)
+    start_x, start_y, end_x, end_y = bounding_box
+    offset = np.array((left, top))
+    scale = np.array(((end_x - start_x) / width, (end_y - start_y) / height))
+    polylines = []
+    for element in root.iter():
+        for polyline in element_polylines(element):
+            polylines.append((polyline - offset) * scale + (start_x, start_y))
+    return polylines
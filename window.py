@@ -0,0 +1,65 @@
+#!/usr/bin/env python3.5
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import logging
+from marker import Marker
+
+
+def measure(device, window, moves=50, timeout=300):
+    """Marks moves needle points with given flow-control window and returns
+    acknowledged commands per second."""
+    marker = Marker(device, log_level=logging.WARNING, window=window)
+    marker.start()
+    count = marker.count['ST']
+    try:
+        # init and home are not part of the measurement
+        start = time.time()
+        while not count.ready:
+            if time.time() - start > timeout:
+                raise Exception('No answer from %s.' % device)
+            time.sleep(.01)
+
+        # zig-zag of short moves like a raster job
+        points = [(1 + (i % 10) / 5.0, 1 + (i // 10) / 5.0)
+                  for i in range(moves)]
+        start = time.time()
+        marker.mark_points(points, order='raster')
+        while not count.ready:
+            if time.time() - start > timeout:
+                raise Exception('Window %d timed out.' % window)
+            time.sleep(.001)
+        return 2 * moves / (time.time() - start)
+    finally:
+        # the next marker must not share the port with this one
+        marker.close()
+
+
+def measure_windows(device, windows=(1, 2, 4, 8, 16, 32), moves=50,
+                    tolerance=.05):
+    """Measures throughput for each window size and returns the smallest
+    window within tolerance of the best one together with all results.
+
+    Only a controller shows where its input buffer overflows. The emulator
+    has no input buffer, so against it larger windows never lose commands
+    and the throughput alone decides."""
+    results = {}
+    for window in windows:
+        results[window] = measure(device, window, moves)
+        logging.info('window %2d: %.1f commands/s' % (window,
+                                                      results[window]))
+    best = max(results.values())
+    window = min(w for w, rate in results.items()
+                 if rate >= best * (1 - tolerance))
+    return window, results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)-8s %(message)s',
+                        datefmt='%H:%M:%S')
+    if len(sys.argv) != 2:
+        sys.exit('usage: %s <device>' % sys.argv[0])
+    window, _ = measure_windows(sys.argv[1])
+    logging.info('recommended window: %d' % window)